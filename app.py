@@ -3,31 +3,56 @@ Aplicação Flask para Máquina de Busca
 Algoritmos 2 - TP1
 """
 
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify
 import os
+import json
+import time
+from itertools import islice
 from inverted_index import InvertedIndex
+from mapped_index import MappedIndex
 from query_processor import QueryProcessor
+from query_cache import QueryCache
+from scoring_pool import ScoringPool
 
 app = Flask(__name__)
 
-# Variáveis globais
-index = InvertedIndex()
-query_processor = None
-
 # Configurações
 CORPUS_PATH = 'bbc'  # Pasta onde está o corpus BBC
-INDEX_PATH = 'index.json'  # Arquivo onde o índice será salvo
+INDEX_PATH = 'index.bin'  # Arquivo onde o índice será salvo
 RESULTS_PER_PAGE = 10
+INDEX_WORKERS = os.cpu_count() or 1  # Processos usados para construir o índice
+MMAP_INDEX = True  # Lê o índice via mmap, compartilhando as páginas entre processos
+QUERY_CACHE_BYTES = 16 * 1024 * 1024  # Memória máxima do cache de resultados de consultas
+SUGGESTIONS = 10  # Máximo de sugestões do autocompletar
+PREFIX_EXPANSIONS = 64  # Máximo de termos em que um prefixo (econom*) é expandido
+POSITIONAL_INDEX = True  # Guarda as posições dos termos (consultas de frase e snippets)
+VECTOR_SCORING = True  # Pontua os candidatos com NumPy, se estiver instalado
+BATCH_MAX_QUERIES = 10000  # Máximo de consultas por requisição em /api/search/batch
+BATCH_MAX_RESULTS = 100  # Máximo de resultados por consulta do lote
+BATCH_WORKERS = 1  # Threads que avaliam as consultas de um lote
+SERVER_THREADS = 8  # Threads que atendem requisições em server.py
+SCORING_PROCESSES = os.cpu_count() or 1  # Processos que avaliam consultas em server.py
+
+# Variáveis globais
+index = InvertedIndex(positional=POSITIONAL_INDEX)
+query_processor = None
+scoring_pool = None
 
+query_cache = QueryCache(QUERY_CACHE_BYTES)
 
-def initialize_index():
-    """Inicializa ou carrega o índice invertido"""
-    global query_processor
+
+def initialize_index(scoring_processes=0):
+    """Inicializa ou carrega o índice invertido.
+
+    Com scoring_processes > 0 e o índice mapeado do disco, as consultas são
+    avaliadas em um ScoringPool com esse número de processos.
+    """
+    global query_processor, scoring_pool
     
     # Tenta carregar o índice do disco
     if os.path.exists(INDEX_PATH):
         print("Índice encontrado, carregando...")
-        if index.load_index(INDEX_PATH):
+        if open_index():
             print("Índice carregado com sucesso!")
         else:
             print("Erro ao carregar índice, criando novo...")
@@ -37,8 +62,21 @@ def initialize_index():
         print("Índice não encontrado, criando novo...")
         create_new_index()
     
+    # Os processos do pool abrem o mesmo arquivo, então só servem o índice mapeado
+    if scoring_processes > 0 and isinstance(index, MappedIndex):
+        print(f"Iniciando {scoring_processes} processos de pontuação...")
+        scoring_pool = ScoringPool(INDEX_PATH, scoring_processes, max_expansions=PREFIX_EXPANSIONS,
+                                   vectorized=VECTOR_SCORING)
+        scoring_pool.start()
+    
     # Inicializa o QueryProcessor
-    query_processor = QueryProcessor(index)
+    query_processor = QueryProcessor(index, cache=query_cache, max_expansions=PREFIX_EXPANSIONS,
+                                     vectorized=VECTOR_SCORING, pool=scoring_pool)
+    
+    # Monta as anotações do autocompletar e a matriz da pontuação vetorizada
+    # antes da primeira requisição
+    index.suggest("a", SUGGESTIONS)
+    query_processor.warm_up()
     
     # Estatísticas
     stats = index.get_statistics()
@@ -50,6 +88,37 @@ def initialize_index():
     print("================================\n")
 
 
+def open_index():
+    """Abre o índice salvo em disco"""
+    global index
+    
+    if not MMAP_INDEX:
+        return index.load_index(INDEX_PATH)
+    
+    # Alterações incrementais do journal são incorporadas ao arquivo antes do mapeamento
+    if os.path.exists(InvertedIndex.delta_path(INDEX_PATH)):
+        if not index.load_index(INDEX_PATH):
+            return False
+        index.save_index(INDEX_PATH)
+    
+    # Postings e documentos são decodificados sob demanda a partir do arquivo
+    try:
+        index = MappedIndex(INDEX_PATH)
+        return True
+    except (OSError, ValueError) as e:
+        print(f"Erro ao mapear índice: {e}")
+        return False
+
+
+def close_scoring_pool():
+    """Encerra os processos de pontuação, se houver"""
+    global scoring_pool
+    
+    if scoring_pool is not None:
+        scoring_pool.close()
+        scoring_pool = None
+
+
 def create_new_index():
     """Cria um novo índice a partir do corpus"""
     if not os.path.exists(CORPUS_PATH):
@@ -58,10 +127,41 @@ def create_new_index():
         return
     
     # Indexa os documentos
-    index.index_documents(CORPUS_PATH)
+    index.index_documents(CORPUS_PATH, workers=INDEX_WORKERS)
     
     # Salva o índice em disco
     index.save_index(INDEX_PATH)
+    
+    # Passa a servir o índice a partir do arquivo recém-criado
+    if MMAP_INDEX:
+        open_index()
+
+
+def get_page_results(query, page):
+    """Ranqueia a consulta e monta os resultados detalhados de uma página"""
+    # Só os page * RESULTS_PER_PAGE melhores scores são mantidos
+    total_results, top_results = query_processor.process_query_top_k(
+        query, page * RESULTS_PER_PAGE)
+    
+    # Extrai termos da consulta, com os prefixos já expandidos
+    query_terms = query_processor._extract_terms(query)
+    
+    # Snippets são gerados apenas para os resultados visíveis
+    start_idx = (page - 1) * RESULTS_PER_PAGE
+    paginated_results = []
+    for doc_id, score in top_results[start_idx:]:
+        doc = index.get_document(doc_id, content=False)
+        if doc:
+            snippet = query_processor.generate_snippet(doc_id, query_terms)
+            paginated_results.append({
+                'doc_id': doc_id,
+                'title': doc['title'],
+                'category': doc['category'],
+                'snippet': snippet,
+                'score': score
+            })
+    
+    return paginated_results, total_results
 
 
 @app.route('/')
@@ -85,34 +185,10 @@ def search():
                              page=1,
                              total_pages=0)
     
-    # Faz a consulta
-    results = query_processor.process_query(query)
-    
-    # Extrai termos da consulta
-    query_terms = query_processor._extract_terms(query)
-    
-    # Prepara os resultados com informações completas
-    detailed_results = []
-    for doc_id, score in results:
-        doc = index.get_document(doc_id)
-        if doc:
-            snippet = query_processor.generate_snippet(doc_id, query_terms)
-            detailed_results.append({
-                'doc_id': doc_id,
-                'title': doc['title'],
-                'category': doc['category'],
-                'snippet': snippet,
-                'score': score
-            })
-    
-    # Paginação
-    total_results = len(detailed_results)
+    # Faz a consulta (apenas a página visível é detalhada)
+    paginated_results, total_results = get_page_results(query, page)
     total_pages = (total_results + RESULTS_PER_PAGE - 1) // RESULTS_PER_PAGE
     
-    start_idx = (page - 1) * RESULTS_PER_PAGE
-    end_idx = start_idx + RESULTS_PER_PAGE
-    paginated_results = detailed_results[start_idx:end_idx]
-    
     return render_template('results.html',
                          query=query,
                          results=paginated_results,
@@ -147,37 +223,107 @@ def api_search():
             'total_pages': 0
         })
     
+    paginated_results, total_results = get_page_results(query, page)
+    total_pages = (total_results + RESULTS_PER_PAGE - 1) // RESULTS_PER_PAGE
     
-    results = query_processor.process_query(query)
-    query_terms = query_processor._extract_terms(query)
+    response = {
+        'query': query,
+        'results': paginated_results,
+        'total_results': total_results,
+        'page': page,
+        'total_pages': total_pages
+    }
     
+    # ?explain=1 inclui o plano de execução da consulta booleana
+    if request.args.get('explain', '').lower() in ('1', 'true'):
+        response['plan'] = query_processor.explain(query)
     
-    detailed_results = []
-    for doc_id, score in results:
-        doc = index.get_document(doc_id)
-        if doc:
-            snippet = query_processor.generate_snippet(doc_id, query_terms)
-            detailed_results.append({
+    return jsonify(response)
+
+
+@app.route('/api/search/batch', methods=['POST'])
+def api_search_batch():
+    """API endpoint para avaliar várias consultas em uma requisição (JSON)"""
+    data = request.get_json(silent=True) or {}
+    queries = data.get('queries')
+    
+    if not isinstance(queries, list) or not all(isinstance(query, str) for query in queries):
+        return jsonify({'error': 'Envie {"queries": [consultas]}'}), 400
+    if len(queries) > BATCH_MAX_QUERIES:
+        return jsonify({'error': f'Máximo de {BATCH_MAX_QUERIES} consultas por lote'}), 400
+    
+    try:
+        k = int(data.get('k', RESULTS_PER_PAGE))
+        if k < 1:
+            raise ValueError(k)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'k deve ser um inteiro positivo'}), 400
+    k = min(k, BATCH_MAX_RESULTS)
+    
+    # Sem snippets: apenas doc_ids e scores, na ordem das consultas
+    start = time.perf_counter()
+    batch = query_processor.process_batch(queries, k, workers=BATCH_WORKERS)
+    elapsed = (time.perf_counter() - start) * 1000
+    
+    return jsonify({
+        'results': [{
+            'query': entry['query'],
+            'total_results': entry['total_results'],
+            'results': [{'doc_id': doc_id, 'score': score} for doc_id, score in entry['results']],
+            'time_ms': entry['time_ms']
+        } for entry in batch],
+        'time_ms': elapsed
+    })
+
+
+@app.route('/api/search/stream')
+def api_search_stream():
+    """API endpoint que envia todo o resultado em NDJSON, um documento por linha"""
+    query = request.args.get('q', '')
+    limit = request.args.get('limit', type=int)  # sem limite, todo o resultado
+    if limit is not None and limit < 0:
+        # Validado antes da resposta: dentro do gerador o erro viria depois do status 200
+        return jsonify({'error': 'limit não pode ser negativo'}), 400
+    snippets = request.args.get('snippets', '1').lower() not in ('0', 'false')
+    
+    query_terms = query_processor._extract_terms(query) if snippets else []
+    
+    def generate():
+        # Cada linha (e seu snippet) só é montada quando o servidor pede a
+        # próxima; se o cliente desconecta, o servidor fecha o gerador e a
+        # geração para ali
+        for doc_id, score in islice(query_processor.iter_results(query), limit):
+            doc = index.get_document(doc_id, content=False)
+            if not doc:
+                continue
+            hit = {
                 'doc_id': doc_id,
                 'title': doc['title'],
                 'category': doc['category'],
-                'snippet': snippet,
                 'score': score
-            })
+            }
+            if snippets:
+                hit['snippet'] = query_processor.generate_snippet(doc_id, query_terms)
+            yield json.dumps(hit, ensure_ascii=False) + '\n'
     
-    total_results = len(detailed_results)
-    total_pages = (total_results + RESULTS_PER_PAGE - 1) // RESULTS_PER_PAGE
+    return Response(generate(), mimetype='application/x-ndjson')
+
+
+@app.route('/api/suggest')
+def api_suggest():
+    """API endpoint para autocompletar: termos mais frequentes com o prefixo"""
+    prefix = request.args.get('prefix', '').strip().lower()
+    # k não numérico fica com o padrão
+    k = request.args.get('k', SUGGESTIONS, type=int)
+    if k < 1:
+        return jsonify({'error': 'k deve ser positivo'}), 400
+    k = min(k, SUGGESTIONS)
     
-    start_idx = (page - 1) * RESULTS_PER_PAGE
-    end_idx = start_idx + RESULTS_PER_PAGE
-    paginated_results = detailed_results[start_idx:end_idx]
+    suggestions = index.suggest(prefix, k) if prefix else []
     
     return jsonify({
-        'query': query,
-        'results': paginated_results,
-        'total_results': total_results,
-        'page': page,
-        'total_pages': total_pages
+        'prefix': prefix,
+        'suggestions': [{'term': term, 'frequency': freq} for term, freq in suggestions]
     })
 
 
@@ -185,6 +331,11 @@ def api_search():
 def api_stats():
     """API endpoint para estatísticas do índice"""
     stats = index.get_statistics()
+    stats['query_cache'] = query_cache.get_statistics()
+    if hasattr(index, 'posting_cache'):
+        stats['posting_cache'] = index.posting_cache.get_statistics()
+    if hasattr(index, 'bodies'):
+        stats['document_store'] = index.bodies.get_statistics()
     return jsonify(stats)
 
 
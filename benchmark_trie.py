@@ -0,0 +1,111 @@
+"""
+Benchmark da Trie Compacta
+Mede memória dos nós e tempo das travessias sobre o vocabulário do corpus.
+
+Uso: python benchmark_trie.py [pasta do corpus]
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+from compact_trie import CompactTrie, TrieNode
+from inverted_index import InvertedIndex
+
+
+def load_vocabulary(corpus_path):
+    """Retorna {termo: set de doc_ids} do corpus"""
+    vocabulary = {}
+    for category in sorted(os.listdir(corpus_path)):
+        category_path = os.path.join(corpus_path, category)
+        if not os.path.isdir(category_path):
+            continue
+
+        for filename in sorted(os.listdir(category_path)):
+            if not filename.endswith('.txt'):
+                continue
+            doc_id = f"{category}/{filename}"
+            with open(os.path.join(category_path, filename), 'r', encoding='utf-8', errors='ignore') as f:
+                for term in set(InvertedIndex._tokenize(f.read())):
+                    vocabulary.setdefault(term, set()).add(doc_id)
+
+    return vocabulary
+
+
+def node_memory(trie):
+    """(número de nós, bytes) da estrutura dos nós, sem os contêineres de documentos"""
+    count = 0
+    size = 0
+    stack = [trie.root]
+    while stack:
+        node = stack.pop()
+        count += 1
+        size += sys.getsizeof(node) + sys.getsizeof(node.children) + sys.getsizeof(node.prefix)
+        if hasattr(node, '__dict__'):
+            size += sys.getsizeof(node.__dict__)
+        stack.extend(node.children.values())
+    return count, size
+
+
+def timed(label, function, repeat=3):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f"{label:<36} {elapsed * 1000:9.2f} ms")
+    return result
+
+
+def main():
+    corpus_path = sys.argv[1] if len(sys.argv) > 1 else 'bbc'
+    if not os.path.exists(corpus_path):
+        print(f"ERRO: Corpus não encontrado em '{corpus_path}'")
+        return 1
+
+    vocabulary = load_vocabulary(corpus_path)
+    print(f"Vocabulário: {len(vocabulary)} termos\n")
+
+    def build():
+        trie = CompactTrie()
+        for term, doc_ids in vocabulary.items():
+            trie.insert_all(term, doc_ids)
+        return trie
+
+    tracemalloc.start()
+    trie = build()
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    count, size = node_memory(trie)
+    print("=== Memória ===")
+    print(f"TrieNode usa __slots__: {not hasattr(TrieNode(), '__dict__')}")
+    print(f"Nós: {count}")
+    print(f"Estrutura dos nós: {size / 1024:.0f} KiB ({size / count:.0f} bytes por nó)")
+    print(f"Total alocado (com documentos): {allocated / 1024:.0f} KiB\n")
+
+    prefixes = sorted({term[:2] for term in vocabulary})
+    frozen = trie.freeze()
+
+    print("=== Tempo ===")
+    timed("Construção", build)
+    items = sorted(vocabulary.items())
+    timed("Construção em lote (from_sorted)", lambda: CompactTrie.from_sorted(items))
+    timed("get_all_words", trie.get_all_words)
+    timed("starts_with (prefixos de 2 letras)", lambda: [trie.starts_with(p) for p in prefixes])
+    timed("search (todos os termos)", lambda: [trie.search(term) for term in vocabulary])
+    data = timed("to_dict", trie.to_dict)
+    timed("from_dict", lambda: CompactTrie.from_dict(data))
+    timed("freeze", trie.freeze)
+    timed("FrozenTrie.starts_with", lambda: [frozen.starts_with(p) for p in prefixes])
+    timed("FrozenTrie.search", lambda: [frozen.search(term) for term in vocabulary])
+
+    sample = sorted(vocabulary)[::max(1, len(vocabulary) // 100)]
+    for max_edits in (1, 2):
+        timed(f"fuzzy_search (k={max_edits}, {len(sample)} termos)",
+                        lambda: [trie.fuzzy_search(term, max_edits) for term in sample], repeat=1)
+
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -1,56 +1,180 @@
+from array import array
+
+
 class TrieNode:
-    def __init__(self, prefix=""):
+    # Sem __dict__ por instância: a Trie do vocabulário tem dezenas de milhares de nós
+    __slots__ = ('prefix', 'children', 'documents', 'is_end_of_word', 'completions')
+
+    def __init__(self, prefix="", documents=None):
         self.prefix = prefix
         self.children = {}
-        self.documents = set()
+        self.documents = documents if documents is not None else set()
         self.is_end_of_word = False
+        self.completions = None  # [(-peso, palavra)] mais pesadas da subárvore (build_completions)
 
     def to_dict(self):
+        result = self._node_dict(self)
+        # Pilha de (nó, dicionário já criado para ele)
+        stack = [(self, result)]
+        while stack:
+            node, data = stack.pop()
+            for key, child in node.children.items():
+                child_data = self._node_dict(child)
+                data['children'][key] = child_data
+                stack.append((child, child_data))
+        return result
+
+    @staticmethod
+    def _node_dict(node):
         return {
-            'prefix': self.prefix,
-            'children': {k: v.to_dict() for k, v in self.children.items()},
-            'documents': list(self.documents),
-            'is_end_of_word': self.is_end_of_word
+            'prefix': node.prefix,
+            'children': {},
+            'documents': list(node.documents),
+            'is_end_of_word': node.is_end_of_word
         }
 
     @staticmethod
     def from_dict(data):
+        root = TrieNode._node_from_dict(data)
+        stack = [(root, data)]
+        while stack:
+            node, node_data = stack.pop()
+            for key, child_data in node_data['children'].items():
+                child = TrieNode._node_from_dict(child_data)
+                node.children[key] = child
+                stack.append((child, child_data))
+        return root
+
+    @staticmethod
+    def _node_from_dict(data):
         node = TrieNode(data['prefix'])
         node.documents = set(data['documents'])
         node.is_end_of_word = data['is_end_of_word']
-        node.children = {k: TrieNode.from_dict(v) for k, v in data['children'].items()}
         return node
 
 
 class CompactTrie:
-    def __init__(self):
-        self.root = TrieNode("")
+    def __init__(self, documents_factory=set):
+        # documents_factory cria o contêiner de documentos de cada nó
+        # (um set por padrão; o índice invertido usa PostingList)
+        self.documents_factory = documents_factory
+        self.root = TrieNode("", documents_factory())
         self.total_words = 0
     
+    @classmethod
+    def from_sorted(cls, items, documents_factory=set):
+        """Constrói a Trie de uma vez a partir de (palavra, documentos) em ordem lexicográfica.
+
+        As palavras já devem estar em minúsculas e sem repetição. Cada nó é
+        criado com o rótulo definitivo (a partir do maior prefixo comum entre
+        palavras vizinhas), em uma única passada e sem divisões de nós.
+        """
+        trie = cls(documents_factory)
+        
+        # Caminho mais à direita ainda aberto: [nó, profundidade no fim do
+        # rótulo, palavra de onde o rótulo é recortado]
+        stack = [[trie.root, 0, ""]]
+        previous = None
+        
+        for word, documents in items:
+            if not word:
+                continue
+            if previous is not None and word <= previous:
+                raise ValueError(f"Palavras fora de ordem: {previous!r} seguida de {word!r}")
+            
+            # Maior prefixo comum com a palavra anterior
+            common = 0
+            if previous is not None:
+                limit = min(len(previous), len(word))
+                while common < limit and previous[common] == word[common]:
+                    common += 1
+            
+            # Fecha os nós abaixo do ponto de bifurcação
+            last = None
+            while stack[-1][1] > common:
+                last = stack.pop()
+                if stack[-1][1] < common:
+                    # Bifurcação no meio do rótulo: nó intermediário com o prefixo comum
+                    stack.append([TrieNode("", documents_factory()), common, word])
+                _attach(stack[-1], last)
+            
+            node = TrieNode("", documents if documents is not None else documents_factory())
+            node.is_end_of_word = True
+            stack.append([node, len(word), word])
+            previous = word
+        
+        while len(stack) > 1:
+            last = stack.pop()
+            _attach(stack[-1], last)
+        
+        return trie
+    
     def insert(self, word, doc_id):
         if not word:
             return
         
         word = word.lower()
-        self._insert_recursive(self.root, word, doc_id, 0)
+        self._insert_node(word).documents.add(doc_id)
     
-    def _insert_recursive(self, node, word, doc_id, depth):
-        if depth == len(word):
-            node.is_end_of_word = True
-            node.documents.add(doc_id)
+    def insert_all(self, word, doc_ids):
+        """Insere a palavra uma única vez associando todos os documentos"""
+        if not word:
             return
         
-        char = word[depth]
+        word = word.lower()
+        self._insert_node(word).documents.update(doc_ids)
+    
+    def setdefault(self, word, documents=None):
+        """Como dict.setdefault: retorna o contêiner de documentos da palavra,
+        inserindo-a com documents (ou um contêiner vazio) se ainda não existir"""
+        word = word.lower()
+        node = self._insert_node(word)
+        if documents is not None and not node.documents:
+            node.documents = documents
+        return node.documents
+    
+    def get(self, word):
+        """Retorna o contêiner de documentos da palavra sem copiá-lo, ou None"""
+        if not word:
+            return None
         
-        if char not in node.children:
-            remaining = word[depth:]
-            new_node = TrieNode(remaining)
-            new_node.is_end_of_word = True
-            new_node.documents.add(doc_id)
-            node.children[char] = new_node
-            return
+        node = self._find_node(word.lower(), exact=True)
+        if node and node.is_end_of_word:
+            return node.documents
+        return None
+    
+    def _insert_node(self, word):
+        # Retorna o nó onde a palavra termina, marcado como fim de palavra
+        node = self.root
+        depth = 0
         
-        child = node.children[char]
+        while True:
+            if depth == len(word):
+                node.is_end_of_word = True
+                return node
+            
+            char = word[depth]
+            
+            if char not in node.children:
+                remaining = word[depth:]
+                new_node = TrieNode(remaining, self.documents_factory())
+                new_node.is_end_of_word = True
+                node.children[char] = new_node
+                return new_node
+            
+            child = node.children[char]
+            prefix = child.prefix
+            
+            # Prefixo do nó é completamente consumido: desce para o filho
+            if word.startswith(prefix, depth):
+                node = child
+                depth += len(prefix)
+                continue
+            
+            return self._split_child(node, child, word, depth)
+    
+    def _split_child(self, node, child, word, depth):
+        char = word[depth]
         prefix = child.prefix
         
     # Encontra o maior prefixo comum entre a palavra e o prefixo do nó
@@ -60,14 +184,9 @@ class CompactTrie:
         while common_length < max_compare and prefix[common_length] == word[depth + common_length]:
             common_length += 1
         
-        # Prefixo do nó é completamente consumido
-        if common_length == len(prefix):
-            self._insert_recursive(child, word, doc_id, depth + common_length)
-            return
-        
     # Dividir nó criando intermediário com prefixo comum
         common_prefix = prefix[:common_length]
-        new_node = TrieNode(common_prefix)
+        new_node = TrieNode(common_prefix, self.documents_factory())
         
     # Atualiza filho existente
         child.prefix = prefix[common_length:]
@@ -77,29 +196,81 @@ class CompactTrie:
         # Cria novo nó para o resto da palavra
         if depth + common_length < len(word):
             remaining = word[depth + common_length:]
-            new_child = TrieNode(remaining)
-            new_child.is_end_of_word = True
-            new_child.documents.add(doc_id)
-            new_node.children[remaining[0]] = new_child
+            end_node = TrieNode(remaining, self.documents_factory())
+            new_node.children[remaining[0]] = end_node
         else:
-            new_node.is_end_of_word = True
-            new_node.documents.add(doc_id)
+            end_node = new_node
+        end_node.is_end_of_word = True
         
         # Substitui o filho antigo
         node.children[char] = new_node
+        return end_node
+    
+    def remove(self, word, doc_id):
+        """Remove o documento da palavra; poda e recompacta nós que ficarem vazios.
+
+        Retorna True se o par (palavra, documento) existia.
+        """
+        if not word:
+            return False
+        
+        word = word.lower()
+        
+        # Desce guardando o caminho (pai, chave) até o nó da palavra
+        path = []
+        node = self.root
+        depth = 0
+        
+        while depth < len(word):
+            child = node.children.get(word[depth])
+            if child is None or not word.startswith(child.prefix, depth):
+                return False
+            
+            path.append((node, word[depth]))
+            depth += len(child.prefix)
+            node = child
+        
+        if not node.is_end_of_word or doc_id not in node.documents:
+            return False
+        
+        node.documents.discard(doc_id)
+        if len(node.documents) > 0:
+            return True
+        
+        # A palavra deixou de existir
+        node.is_end_of_word = False
+        
+        while path and not node.is_end_of_word:
+            parent, char = path[-1]
+            
+            if not node.children:
+                # Nó folha vazio é removido; o pai pode precisar ser compactado
+                del parent.children[char]
+                path.pop()
+                node = parent
+                continue
+            
+            if len(node.children) == 1:
+                # Junta o nó com seu único filho
+                child = next(iter(node.children.values()))
+                child.prefix = node.prefix + child.prefix
+                parent.children[char] = child
+            break
+        
+        return True
     
     def search(self, word):
         if not word:
             return set()
         
         word = word.lower()
-        node = self._find_node(word)
+        node = self._find_node(word, exact=True)
         
         if node and node.is_end_of_word:
             return node.documents.copy()
         return set()
     
-    def _find_node(self, word):
+    def _find_node(self, word, exact=False):
         node = self.root
         depth = 0
         
@@ -119,6 +290,10 @@ class CompactTrie:
                 if prefix[i] != word[depth + i]:
                     return None
             
+            # Na busca exata a palavra não pode terminar no meio do prefixo
+            if exact and len(prefix) > len(word) - depth:
+                return None
+            
             depth += len(prefix)
             node = child
         
@@ -135,18 +310,95 @@ class CompactTrie:
             return set()
         
         # Coleta todos os documentos da subárvore
-        return self._collect_all_documents(node)
-    
-    def _collect_all_documents(self, node):
         docs = set()
+        self._collect_all_documents(node, docs)
+        return docs
+    
+    def _collect_all_documents(self, node, docs):
+        # Percorre a subárvore com uma pilha, acumulando em um único conjunto
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if node.is_end_of_word:
+                docs.update(node.documents)
+            stack.extend(node.children.values())
+    
+    def iter_prefix(self, prefix):
+        """Gera (palavra, documentos) das palavras que começam com prefix, em ordem alfabética.
+
+        A subárvore é percorrida uma única vez e sob demanda: quem consome
+        pode parar depois de algumas palavras sem visitar o restante. Os
+        contêineres de documentos são os da Trie, sem cópia.
+        """
+        found = self._find_prefix(prefix.lower())
+        if found is None:
+            return
         
-        if node.is_end_of_word:
-            docs.update(node.documents)
+        stack = [found]
+        while stack:
+            node, word = stack.pop()
+            if node.is_end_of_word:
+                yield word, node.documents
+            for char in sorted(node.children, reverse=True):
+                child = node.children[char]
+                stack.append((child, word + child.prefix))
+    
+    def _find_prefix(self, prefix):
+        # Retorna (nó, palavra até o nó) do primeiro nó cuja palavra começa com prefix
+        node = self.root
+        word = node.prefix
+        depth = 0
         
-        for child in node.children.values():
-            docs.update(self._collect_all_documents(child))
+        while depth < len(prefix):
+            child = node.children.get(prefix[depth])
+            if child is None:
+                return None
+            
+            label = child.prefix
+            if not label.startswith(prefix[depth:depth + len(label)]):
+                return None
+            
+            word += label
+            depth += len(label)
+            node = child
         
-        return docs
+        return node, word
+    
+    def fuzzy_search(self, word, max_edits=1):
+        """Retorna [(palavra, documentos, distância)] das palavras a no máximo
+        max_edits edições (inserção, remoção ou troca de caractere) de word.
+
+        A Trie é percorrida uma única vez levando a linha da matriz de
+        Levenshtein de cada nó; quando todos os valores da linha passam de
+        max_edits, nenhuma palavra da subárvore pode casar e ela é
+        descartada sem ser visitada. O resultado está em ordem alfabética.
+        """
+        automaton = LevenshteinAutomaton(word.lower(), max_edits)
+        step = automaton.step
+        results = []
+        # Cada entrada já consumiu o primeiro caractere do rótulo do nó, o que
+        # descarta os filhos sem casamento antes de empilhá-los
+        stack = [(self.root, self.root.prefix, automaton.start)]
+        
+        while stack:
+            node, current, state = stack.pop()
+            label = node.prefix
+            for i in range(1, len(label)):
+                state = step(state, label[i])
+                if state is None:
+                    break
+            if state is None:
+                continue
+            
+            if node.is_end_of_word and automaton.distance(state) <= max_edits:
+                results.append((current, node.documents, automaton.distance(state)))
+            for char, child in node.children.items():
+                child_state = step(state, char)
+                if child_state is not None:
+                    stack.append((child, current + child.prefix, child_state))
+        
+        results.sort(key=lambda result: result[0])
+        return results
     
     def get_all_words(self):
         words = []
@@ -155,12 +407,24 @@ class CompactTrie:
     
     def _collect_words(self, node, current_word, words):
         current_word += node.prefix
-        
         if node.is_end_of_word:
             words.append((current_word, node.documents.copy()))
         
-        for child in node.children.values():
-            self._collect_words(child, current_word, words)
+        # Pré-ordem iterativa: a pilha guarda um iterador dos filhos de cada
+        # nível, o que mantém a ordem de inserção sem empilhar cada filho
+        stack = [(iter(node.children.values()), current_word)]
+        while stack:
+            children, parent_word = stack[-1]
+            child = next(children, None)
+            if child is None:
+                stack.pop()
+                continue
+            
+            child_word = parent_word + child.prefix
+            if child.is_end_of_word:
+                words.append((child_word, child.documents.copy()))
+            if child.children:
+                stack.append((iter(child.children.values()), child_word))
     
     def to_dict(self):
         return {
@@ -179,4 +443,344 @@ class CompactTrie:
         return len(self.get_all_words())
     
     def __contains__(self, word):
-        return len(self.search(word)) > 0
+        documents = self.get(word)
+        return documents is not None and len(documents) > 0
+    
+    def build_completions(self, weights, k=10):
+        """Anota cada nó com as k palavras de maior peso da sua subárvore.
+
+        weights mapeia palavra -> peso (por exemplo, a frequência no corpus).
+        Os nós são processados de baixo para cima, e cada um combina apenas as
+        listas já calculadas dos filhos, então o custo total é linear no
+        número de nós. As anotações não acompanham inserções e remoções
+        posteriores: depois de alterar a Trie, chame de novo, ou chame
+        update_completions para cada palavra alterada.
+        """
+        # Pré-ordem iterativa com a palavra de cada nó; invertida, visita os
+        # filhos antes dos pais
+        order = []
+        stack = [(self.root, "")]
+        while stack:
+            node, word = stack.pop()
+            word += node.prefix
+            order.append((node, word))
+            stack.extend([(child, word) for child in node.children.values()])
+        
+        for node, word in reversed(order):
+            self._annotate(node, word, weights, k)
+    
+    def update_completions(self, word, weights, k=10):
+        """Refaz as anotações de build_completions depois que o peso de word mudou.
+
+        word já deve estar na Trie (insira antes, se for nova); uma palavra
+        fora de weights sai das anotações. Só os nós do caminho até word são
+        recalculados, de baixo para cima, a partir das listas dos filhos.
+        """
+        word = word.lower()
+        path = [(self.root, "")]
+        node = self.root
+        depth = 0
+        
+        while depth < len(word):
+            child = node.children.get(word[depth])
+            if child is None or not word.startswith(child.prefix, depth):
+                return
+            depth += len(child.prefix)
+            node = child
+            path.append((node, word[:depth]))
+        
+        for node, node_word in reversed(path):
+            self._annotate(node, node_word, weights, k)
+    
+    @staticmethod
+    def _annotate(node, word, weights, k):
+        candidates = []
+        if node.is_end_of_word and word in weights:
+            candidates.append((-weights[word], word))
+        for child in node.children.values():
+            # Nós criados depois da última anotação (divisões) só aparecem no
+            # caminho da palavra inserida, que é recalculado
+            candidates.extend(child.completions or ())
+        
+        # Maior peso primeiro; empates em ordem alfabética
+        candidates.sort()
+        node.completions = candidates[:k]
+    
+    def top_completions(self, prefix, k=10):
+        """Retorna [(palavra, peso)] das k palavras de maior peso que começam com prefix.
+
+        Usa as anotações de build_completions: o custo é o da descida pelo
+        prefixo, sem percorrer a subárvore.
+        """
+        node = self._find_node(prefix.lower())
+        if node is None or node.completions is None:
+            return []
+        return [(word, -weight) for weight, word in node.completions[:k]]
+    
+    def freeze(self):
+        """Versão somente leitura em arrays (FrozenTrie), construída em uma passada"""
+        return FrozenTrie(self)
+
+
+class LevenshteinAutomaton:
+    """Autômato das palavras a no máximo max_edits edições de word.
+
+    Cada estado é a linha da matriz de Levenshtein para o texto lido até
+    ali, com os valores limitados a max_edits + 1; com esse limite a linha
+    não depende da profundidade, e o mesmo estado reaparece em muitos ramos
+    da Trie. As transições são calculadas sob demanda e memorizadas, então
+    o autômato determinístico é construído só nas partes que a travessia
+    visita. Caracteres que não aparecem em word levam à mesma transição.
+    """
+    
+    def __init__(self, word, max_edits):
+        self.word = word
+        self.max_edits = max_edits
+        self.letters = set(word)
+        self.start = tuple(min(i, max_edits + 1) for i in range(len(word) + 1))
+        self.transitions = {}
+    
+    def step(self, state, char):
+        """Próximo estado, ou None se nenhuma continuação pode casar"""
+        if char not in self.letters:
+            char = None
+        
+        key = (state, char)
+        if key in self.transitions:
+            return self.transitions[key]
+        
+        word = self.word
+        limit = self.max_edits + 1
+        new = [state[0] + 1 if state[0] < limit else limit]
+        for i in range(1, len(word) + 1):
+            cost = state[i - 1] if word[i - 1] == char else state[i - 1] + 1
+            if state[i] + 1 < cost:
+                cost = state[i] + 1
+            if new[i - 1] + 1 < cost:
+                cost = new[i - 1] + 1
+            new.append(cost if cost < limit else limit)
+        
+        result = tuple(new) if min(new) < limit else None
+        self.transitions[key] = result
+        return result
+    
+    def distance(self, state):
+        """Distância até word, se a palavra terminar neste estado (max_edits + 1 = fora do limite)"""
+        return state[-1]
+
+
+def _attach(parent, child):
+    # Define o rótulo do filho (trecho entre as profundidades) e o liga ao pai
+    node, depth, word = child
+    node.prefix = word[parent[1]:depth]
+    parent[0].children[node.prefix[0]] = node
+
+
+class FrozenTrie:
+    """Trie compacta imutável armazenada em arrays.
+
+    Os nós ficam em pré-ordem (filhos em ordem de caractere), então a
+    subárvore de um nó n ocupa o intervalo [n, subtree_end[n]). Os rótulos
+    são concatenados em uma única string; as arestas de cada nó são um
+    trecho contíguo de edge_chars (primeiro caractere do rótulo do filho) e
+    edge_targets (id do filho), localizado com str.find. Os contêineres de
+    documentos são os mesmos da Trie original, referenciados por índice.
+    """
+    
+    def __init__(self, trie):
+        self.documents_factory = trie.documents_factory
+        self.total_words = trie.total_words
+        
+        # Pré-ordem iterativa
+        nodes = []
+        stack = [trie.root]
+        while stack:
+            node = stack.pop()
+            nodes.append(node)
+            stack.extend(node.children[char] for char in sorted(node.children, reverse=True))
+        numbers = {id(node): number for number, node in enumerate(nodes)}
+        
+        labels = []
+        label_offset = 0
+        self.label_start = array('I')
+        self.label_len = array('I')
+        self.first_edge = array('I')
+        self.edge_targets = array('I')
+        edge_chars = []
+        self.value = array('i')  # índice em values, -1 se o nó não termina palavra
+        self.values = []
+        
+        for node in nodes:
+            labels.append(node.prefix)
+            self.label_start.append(label_offset)
+            self.label_len.append(len(node.prefix))
+            label_offset += len(node.prefix)
+            
+            if node.is_end_of_word:
+                self.value.append(len(self.values))
+                self.values.append(node.documents)
+            else:
+                self.value.append(-1)
+            
+            self.first_edge.append(len(self.edge_targets))
+            for char in sorted(node.children):
+                edge_chars.append(char)
+                self.edge_targets.append(numbers[id(node.children[char])])
+        
+        # Sentinela: as arestas do nó n vão de first_edge[n] a first_edge[n + 1]
+        self.first_edge.append(len(self.edge_targets))
+        self.labels = ''.join(labels)
+        self.edge_chars = ''.join(edge_chars)
+        
+        # Fim da subárvore: o último filho (maior id) determina o intervalo
+        self.subtree_end = array('I', [0]) * len(nodes)
+        for number in range(len(nodes) - 1, -1, -1):
+            last = self.first_edge[number + 1]
+            if last > self.first_edge[number]:
+                self.subtree_end[number] = self.subtree_end[self.edge_targets[last - 1]]
+            else:
+                self.subtree_end[number] = number + 1
+    
+    def _find_node(self, word, exact=False):
+        # Retorna o id do nó alcançado pela palavra, ou -1
+        node = 0
+        depth = 0
+        
+        while depth < len(word):
+            edge = self.edge_chars.find(word[depth], self.first_edge[node], self.first_edge[node + 1])
+            if edge < 0:
+                return -1
+            
+            node = self.edge_targets[edge]
+            start = self.label_start[node]
+            length = self.label_len[node]
+            remaining = len(word) - depth
+            
+            if length > remaining:
+                # A palavra termina no meio do rótulo
+                if exact or not self.labels.startswith(word[depth:], start):
+                    return -1
+                return node
+            
+            if not self.labels.startswith(word[depth:depth + length], start):
+                return -1
+            depth += length
+        
+        return node
+    
+    def get(self, word):
+        """Retorna o contêiner de documentos da palavra sem copiá-lo, ou None"""
+        if not word:
+            return None
+        
+        node = self._find_node(word.lower(), exact=True)
+        if node < 0 or self.value[node] < 0:
+            return None
+        return self.values[self.value[node]]
+    
+    def search(self, word):
+        documents = self.get(word)
+        if documents is None:
+            return set()
+        return documents.copy()
+    
+    def starts_with(self, prefix):
+        if not prefix:
+            return set()
+        
+        node = self._find_node(prefix.lower())
+        if node < 0:
+            return set()
+        
+        # A subárvore é um intervalo contíguo de ids
+        docs = set()
+        for number in range(node, self.subtree_end[node]):
+            if self.value[number] >= 0:
+                docs.update(self.values[self.value[number]])
+        return docs
+    
+    def iter_prefix(self, prefix):
+        """Gera (palavra, documentos) das palavras que começam com prefix, em ordem alfabética"""
+        prefix = prefix.lower()
+        node = 0
+        word = ""
+        
+        # Desce pelo prefixo acumulando os rótulos completos
+        while len(word) < len(prefix):
+            edge = self.edge_chars.find(prefix[len(word)], self.first_edge[node], self.first_edge[node + 1])
+            if edge < 0:
+                return
+            
+            node = self.edge_targets[edge]
+            start = self.label_start[node]
+            label = self.labels[start:start + self.label_len[node]]
+            if not label.startswith(prefix[len(word):len(word) + len(label)]):
+                return
+            word += label
+        
+        stack = [(node, word)]
+        while stack:
+            node, word = stack.pop()
+            if self.value[node] >= 0:
+                yield word, self.values[self.value[node]]
+            
+            for edge in range(self.first_edge[node + 1] - 1, self.first_edge[node] - 1, -1):
+                child = self.edge_targets[edge]
+                start = self.label_start[child]
+                stack.append((child, word + self.labels[start:start + self.label_len[child]]))
+    
+    def fuzzy_search(self, word, max_edits=1):
+        """Retorna [(palavra, documentos, distância)] das palavras a no máximo
+        max_edits edições de word, em ordem alfabética (ver CompactTrie.fuzzy_search)"""
+        automaton = LevenshteinAutomaton(word.lower(), max_edits)
+        step = automaton.step
+        labels = self.labels
+        results = []
+        # Como na CompactTrie, cada entrada já consumiu o primeiro caractere do rótulo
+        stack = [(0, "", automaton.start)]
+        
+        while stack:
+            node, current, state = stack.pop()
+            start = self.label_start[node]
+            for position in range(start + 1, start + self.label_len[node]):
+                state = step(state, labels[position])
+                if state is None:
+                    break
+            if state is None:
+                continue
+            
+            if self.value[node] >= 0 and automaton.distance(state) <= max_edits:
+                results.append((current, self.values[self.value[node]], automaton.distance(state)))
+            for edge in range(self.first_edge[node + 1] - 1, self.first_edge[node] - 1, -1):
+                child_state = step(state, self.edge_chars[edge])
+                if child_state is not None:
+                    child = self.edge_targets[edge]
+                    child_start = self.label_start[child]
+                    stack.append((child, current + labels[child_start:child_start + self.label_len[child]],
+                                  child_state))
+        
+        return results
+    
+    def get_all_words(self):
+        words = []
+        # Pilha de (nó, palavra até o pai); a pré-ordem visita as palavras em ordem
+        stack = [(0, "")]
+        while stack:
+            node, parent_word = stack.pop()
+            start = self.label_start[node]
+            word = parent_word + self.labels[start:start + self.label_len[node]]
+            
+            if self.value[node] >= 0:
+                words.append((word, self.values[self.value[node]].copy()))
+            
+            for edge in range(self.first_edge[node + 1] - 1, self.first_edge[node] - 1, -1):
+                stack.append((self.edge_targets[edge], word))
+        
+        return words
+    
+    def __len__(self):
+        return len(self.values)
+    
+    def __contains__(self, word):
+        documents = self.get(word)
+        return documents is not None and len(documents) > 0
@@ -0,0 +1,178 @@
+"""
+Módulo de Armazenamento de Documentos
+Guarda o conteúdo (corpo) dos documentos em blocos comprimidos com zlib.
+
+Os corpos só são usados para montar trechos da página visível e exibir um
+documento, então ficam fora das estruturas do índice: cada registro aponta
+para (bloco, início, tamanho) dentro do bloco descomprimido. Registros
+consecutivos dividem o mesmo bloco, o que dá uma compressão bem melhor que
+a de cada documento isolado. Os registros lidos recentemente ficam em um
+pequeno cache LRU.
+
+Layout da seção serializada (little-endian):
+
+    cabeçalho      número de registros e de blocos
+    blocos         offsets fixos (número de blocos + 1), relativos aos dados
+    registros      (bloco, início, tamanho) de cada registro
+    dados          blocos comprimidos, em ordem
+"""
+
+import struct
+import threading
+import zlib
+from array import array
+from functools import lru_cache
+
+
+BLOCK_SIZE = 16 * 1024  # bytes descomprimidos por bloco
+CACHE_SIZE = 64  # registros mantidos descomprimidos
+
+STORE_HEADER = struct.Struct('<II')  # registros, blocos
+BLOCK_OFFSET = struct.Struct('<Q')
+RECORD = struct.Struct('<III')  # bloco, início, tamanho
+
+
+class DocumentStore:
+    """Registros de texto somente-inclusão, endereçados pela posição (id inteiro do documento)"""
+
+    def __init__(self, block_size=BLOCK_SIZE, cache_size=CACHE_SIZE):
+        self.block_size = block_size
+
+        # Blocos gravados: lidos de buffer nos offsets de _block_offsets
+        self._buffer = None
+        self._block_offsets = array('Q', [0])
+
+        self._blocks = []  # blocos comprimidos criados em memória, depois dos gravados
+        self._tail = bytearray()  # bloco em construção, ainda não comprimido
+
+        self._record_blocks = array('I')
+        self._record_starts = array('I')
+        self._record_lengths = array('I')
+
+        self._last_block = (-1, b'')  # último bloco descomprimido (leituras sequenciais)
+        self._lock = threading.Lock()
+        self.get = lru_cache(maxsize=cache_size)(self.read)
+
+    @classmethod
+    def from_buffer(cls, buffer, offset=0, **kwargs):
+        """Abre uma seção serializada por encode sem copiar os blocos (bytes ou mmap)"""
+        store = cls(**kwargs)
+        record_count, block_count = STORE_HEADER.unpack_from(buffer, offset)
+
+        start = offset + STORE_HEADER.size
+        end = start + BLOCK_OFFSET.size * (block_count + 1)
+        offsets = array('Q', bytes(buffer[start:end]))
+        data = end + RECORD.size * record_count
+        store._block_offsets = array('Q', (data + block_offset for block_offset in offsets))
+
+        # Tabela de registros: triplas (bloco, início, tamanho) intercaladas
+        records = array('I', bytes(buffer[end:data]))
+        store._record_blocks = records[0::3]
+        store._record_starts = records[1::3]
+        store._record_lengths = records[2::3]
+
+        store._buffer = buffer
+        return store
+
+    def __len__(self):
+        return len(self._record_lengths)
+
+    def put(self, number, text):
+        """Guarda text como registro number; posições puladas ficam vazias"""
+        if number < len(self):
+            raise ValueError(f"Registro {number} já existe")
+
+        data = text.encode('utf-8')
+        with self._lock:
+            while len(self) < number:
+                self._append(b'')
+            self._append(data)
+
+    def append(self, text):
+        """Guarda text no próximo registro e retorna sua posição"""
+        number = len(self)
+        self.put(number, text)
+        return number
+
+    def _append(self, data):
+        # Bloco cheio é comprimido antes de receber o novo registro. O bloco
+        # entra na lista antes de o buffer ser trocado, e os dados antes do
+        # registro, para que leituras concorrentes nunca vejam um estado parcial
+        if self._tail and len(self._tail) + len(data) > self.block_size:
+            self._blocks.append(zlib.compress(bytes(self._tail)))
+            self._tail = bytearray()
+
+        block = len(self._block_offsets) - 1 + len(self._blocks)
+        start = len(self._tail)
+        self._tail += data
+        self._record_blocks.append(block)
+        self._record_starts.append(start)
+        self._record_lengths.append(len(data))
+
+    def read(self, number):
+        """Conteúdo do registro number, sem passar pelo cache (leituras sequenciais)"""
+        if number >= len(self):
+            return ''
+
+        block = self._record_blocks[number]
+        start = self._record_starts[number]
+        end = start + self._record_lengths[number]
+        return bytes(self._block(block)[start:end]).decode('utf-8')
+
+    def _block(self, block):
+        stored = len(self._block_offsets) - 1
+        tail = self._tail
+        if block == stored + len(self._blocks):
+            return tail
+
+        cached_block, data = self._last_block
+        if cached_block != block:
+            if block < stored:
+                start, end = self._block_offsets[block], self._block_offsets[block + 1]
+                data = zlib.decompress(self._buffer[start:end])
+            else:
+                data = zlib.decompress(self._blocks[block - stored])
+            self._last_block = (block, data)
+        return data
+
+    def encode(self, numbers=None):
+        """Serializa os registros numbers (todos, por padrão), renumerados em ordem.
+
+        Sem renumeração os blocos já comprimidos são copiados como estão.
+        """
+        if numbers is not None and list(numbers) != list(range(len(self))):
+            compacted = DocumentStore(self.block_size, cache_size=0)
+            for number in numbers:
+                compacted.append(self.read(number))
+            return compacted.encode()
+
+        blocks = [self._buffer[self._block_offsets[i]:self._block_offsets[i + 1]]
+                  for i in range(len(self._block_offsets) - 1)]
+        blocks += self._blocks
+        if self._tail:
+            blocks.append(zlib.compress(bytes(self._tail)))
+
+        out = bytearray(STORE_HEADER.pack(len(self), len(blocks)))
+        offset = 0
+        for block in blocks:
+            out += BLOCK_OFFSET.pack(offset)
+            offset += len(block)
+        out += BLOCK_OFFSET.pack(offset)
+
+        for number in range(len(self)):
+            out += RECORD.pack(self._record_blocks[number], self._record_starts[number],
+                               self._record_lengths[number])
+        for block in blocks:
+            out += block
+        return bytes(out)
+
+    def get_statistics(self):
+        """Registros, blocos, bytes ocupados (blocos comprimidos e o bloco em construção) e bytes originais"""
+        compressed = (self._block_offsets[-1] - self._block_offsets[0]
+                      + sum(len(block) for block in self._blocks))
+        return {
+            'records': len(self),
+            'blocks': len(self._block_offsets) - 1 + len(self._blocks) + (1 if self._tail else 0),
+            'stored_bytes': compressed + len(self._tail),
+            'raw_bytes': sum(self._record_lengths)
+        }
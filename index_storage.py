@@ -0,0 +1,490 @@
+"""
+Módulo de Persistência Binária do Índice
+Formato compacto e versionado usado por InvertedIndex.save_index/load_index.
+
+Layout do arquivo (little-endian):
+
+    cabeçalho      magic, versão, flags, total de documentos, total de termos
+                   e soma dos tamanhos dos documentos
+    seções         tabela com (offset, tamanho) de cada seção
+    DOCS           tabela de documentos: offsets fixos + registros (metadados)
+    TERMS          dicionário de termos ordenado: entradas fixas + texto
+    POSTINGS       listas de (doc, tf) com ids em delta e varint
+    POSITIONS      (versão 3, opcional) por documento, as posições e offsets
+                   de cada termo, com os termos pelo número no dicionário
+    BODIES         (versão 4) conteúdo dos documentos em blocos comprimidos,
+                   no formato de document_store
+    checksum       CRC32 de todo o conteúdo anterior
+
+Os documentos recebem ids inteiros densos (posição na tabela DOCS). As
+entradas de tamanho fixo permitem busca binária por termo e acesso direto a
+um documento sem decodificar o resto do arquivo. Arquivos das versões 2 (sem
+a seção POSITIONS) e 3 (conteúdo dentro dos registros de DOCS) continuam
+legíveis.
+"""
+
+import struct
+import zlib
+from array import array
+from compact_trie import CompactTrie
+from document_store import DocumentStore
+from postings import PostingList
+
+
+MAGIC = b'TPIX'
+FORMAT_VERSION = 4
+SUPPORTED_VERSIONS = (2, 3, 4)
+
+FLAG_POSITIONS = 1  # o arquivo guarda as posições dos termos
+
+HEADER = struct.Struct('<4sHHQQQ')  # magic, versão, flags, total_docs, total_terms, total_length
+SECTION = struct.Struct('<QQ')  # offset, tamanho
+COUNT = struct.Struct('<I')
+DOC_OFFSET = struct.Struct('<Q')
+# offset do texto, tamanho do texto, offset da posting, tamanho da posting,
+# frequência de documentos, frequência no corpus, soma dos quadrados
+TERM_ENTRY = struct.Struct('<IHQIIQQ')
+CHECKSUM = struct.Struct('<I')
+
+SECTION_DOCS = 0
+SECTION_TERMS = 1
+SECTION_POSTINGS = 2
+SECTION_POSITIONS = 3
+SECTION_BODIES = 4
+SECTION_COUNT = 5
+
+# Seções de cada versão do formato
+VERSION_SECTIONS = {2: SECTION_POSITIONS, 3: SECTION_BODIES, 4: SECTION_COUNT}
+
+
+def encode_varint(value, out):
+    """Codifica um inteiro não negativo em LEB128 no bytearray out"""
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def decode_varint(buf, pos):
+    """Decodifica um inteiro LEB128 de buf a partir de pos; retorna (valor, nova posição)"""
+    result = 0
+    shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def encode_positions(positions, offsets):
+    """Codifica as ocorrências de um termo em um documento.
+
+    positions (índice do token) e offsets (caractere no conteúdo) são
+    crescentes; cada ocorrência vira dois varints com a diferença para a
+    anterior, quase sempre um byte cada.
+    """
+    out = bytearray()
+    previous_position = previous_offset = 0
+    for position, offset in zip(positions, offsets):
+        encode_varint(position - previous_position, out)
+        encode_varint(offset - previous_offset, out)
+        previous_position = position
+        previous_offset = offset
+    return bytes(out)
+
+
+def decode_positions(data):
+    """Inverso de encode_positions: retorna (posições, offsets)"""
+    positions = []
+    offsets = []
+    position = offset = 0
+    pos = 0
+    while pos < len(data):
+        delta, pos = decode_varint(data, pos)
+        position += delta
+        delta, pos = decode_varint(data, pos)
+        offset += delta
+        positions.append(position)
+        offsets.append(offset)
+    return positions, offsets
+
+
+def _encode_string(text, out):
+    data = text.encode('utf-8')
+    encode_varint(len(data), out)
+    out += data
+
+
+def _decode_string(buf, pos):
+    length, pos = decode_varint(buf, pos)
+    return bytes(buf[pos:pos + length]).decode('utf-8'), pos + length
+
+
+def is_binary_index(path):
+    """Verifica pelo magic se o arquivo está no formato binário"""
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def save_binary_index(index, path):
+    """Grava o InvertedIndex no formato binário"""
+    # Ids de documentos removidos são descartados e os restantes renumerados
+    live = [number for number, doc_id in enumerate(index.doc_ids) if doc_id is not None]
+    renumber = None
+    if len(live) != len(index.doc_ids):
+        renumber = {number: position for position, number in enumerate(live)}
+
+    # Seção DOCS: offsets fixos seguidos dos registros; o conteúdo vai para BODIES
+    records = bytearray()
+    offsets = bytearray()
+    for number in live:
+        doc_id = index.doc_ids[number]
+        doc = index.documents[doc_id]
+        offsets += DOC_OFFSET.pack(len(records))
+        _encode_string(doc_id, records)
+        _encode_string(doc['title'], records)
+        _encode_string(doc['category'], records)
+        _encode_string(doc['path'], records)
+        encode_varint(index.doc_lengths.get(doc_id, 0), records)
+    offsets += DOC_OFFSET.pack(len(records))
+    docs_section = COUNT.pack(len(live)) + offsets + records
+
+    # Seções TERMS e POSTINGS
+    words = sorted(index.trie.get_all_words(), key=lambda item: item[0].encode('utf-8'))
+    entries = bytearray()
+    term_text = bytearray()
+    postings_section = bytearray()
+    term_count = 0
+    term_numbers = {}  # {termo: posição no dicionário}, usada pela seção POSITIONS
+
+    for term, postings in words:
+        if not postings:
+            continue
+
+        term_bytes = term.encode('utf-8')
+        start = len(postings_section)
+        previous = 0
+        sq_freq = 0
+        for number, freq in zip(postings.ids, postings.tfs):
+            if renumber is not None:
+                number = renumber[number]
+            encode_varint(number - previous, postings_section)
+            encode_varint(freq, postings_section)
+            previous = number
+            sq_freq += freq * freq
+
+        entries += TERM_ENTRY.pack(len(term_text), len(term_bytes),
+                                   start, len(postings_section) - start,
+                                   len(postings),
+                                   index.corpus_term_freq.get(term, 0), sq_freq)
+        term_text += term_bytes
+        term_numbers[term] = term_count
+        term_count += 1
+    terms_section = COUNT.pack(term_count) + entries + term_text
+
+    # Seção POSITIONS: offsets fixos por documento seguidos dos registros
+    flags = 0
+    positions_section = b''
+    if index.positional:
+        flags |= FLAG_POSITIONS
+        records = bytearray()
+        offsets = bytearray()
+        for number in live:
+            offsets += DOC_OFFSET.pack(len(records))
+            stored = index.positions.get(number, {})
+            entries_by_number = sorted((term_numbers[term], data) for term, data in stored.items()
+                                       if term in term_numbers)
+            encode_varint(len(entries_by_number), records)
+            previous = 0
+            for term_number, data in entries_by_number:
+                encode_varint(term_number - previous, records)
+                encode_varint(len(data), records)
+                records += data
+                previous = term_number
+        offsets += DOC_OFFSET.pack(len(records))
+        positions_section = COUNT.pack(len(live)) + offsets + records
+
+    # Seção BODIES: blocos já comprimidos são copiados se não houve remoções
+    bodies_section = index.bodies.encode(live if renumber is not None else None)
+
+    # Monta o arquivo: cabeçalho, tabela de seções e seções
+    sections = [docs_section, terms_section, postings_section, positions_section, bodies_section]
+    offset = HEADER.size + SECTION.size * SECTION_COUNT
+    table = bytearray()
+    for section in sections:
+        table += SECTION.pack(offset, len(section))
+        offset += len(section)
+
+    total_terms = sum(index.corpus_term_freq.values())
+    total_length = sum(index.doc_lengths.values())
+    data = bytearray(HEADER.pack(MAGIC, FORMAT_VERSION, flags, index.total_docs,
+                                 total_terms, total_length))
+    data += table
+    for section in sections:
+        data += section
+    data += CHECKSUM.pack(zlib.crc32(data))
+
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+class IndexFileReader:
+    """Acesso direto às seções de um índice binário em memória (bytes ou mmap)"""
+
+    def __init__(self, buffer, verify_checksum=True):
+        self.buffer = buffer
+
+        if len(buffer) < HEADER.size + CHECKSUM.size:
+            raise ValueError("Arquivo de índice truncado")
+
+        (magic, version, flags, self.total_docs,
+         self.total_terms, self.total_length) = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError("Arquivo não está no formato binário de índice")
+        if version not in SUPPORTED_VERSIONS:
+            raise ValueError(f"Versão de índice não suportada: {version}")
+
+        # A versão 2 não tem a seção POSITIONS, e a 3 não tem BODIES
+        self.version = version
+        section_count = VERSION_SECTIONS[version]
+        if len(buffer) < HEADER.size + SECTION.size * section_count + CHECKSUM.size:
+            raise ValueError("Arquivo de índice truncado")
+
+        if verify_checksum:
+            end = len(buffer) - CHECKSUM.size
+            (stored,) = CHECKSUM.unpack_from(buffer, end)
+            if zlib.crc32(memoryview(buffer)[:end]) != stored:
+                raise ValueError("Checksum do índice não confere")
+
+        self.sections = [SECTION.unpack_from(buffer, HEADER.size + i * SECTION.size)
+                         for i in range(section_count)]
+
+        # Seção DOCS
+        docs_offset = self.sections[SECTION_DOCS][0]
+        (self.doc_count,) = COUNT.unpack_from(buffer, docs_offset)
+        self._doc_offsets = docs_offset + COUNT.size
+        self._doc_records = self._doc_offsets + DOC_OFFSET.size * (self.doc_count + 1)
+
+        # Seção TERMS
+        terms_offset = self.sections[SECTION_TERMS][0]
+        (self.term_count,) = COUNT.unpack_from(buffer, terms_offset)
+        self._term_entries = terms_offset + COUNT.size
+        self._term_text = self._term_entries + TERM_ENTRY.size * self.term_count
+
+        self._postings = self.sections[SECTION_POSTINGS][0]
+
+        # Seção POSITIONS
+        self.has_positions = bool(flags & FLAG_POSITIONS)
+        if self.has_positions:
+            positions_offset = self.sections[SECTION_POSITIONS][0]
+            self._position_offsets = positions_offset + COUNT.size
+            self._position_records = self._position_offsets + DOC_OFFSET.size * (self.doc_count + 1)
+
+        # Seção BODIES; nas versões anteriores o conteúdo fica no registro de DOCS
+        self.bodies = None
+        if version >= 4:
+            self.bodies = DocumentStore.from_buffer(buffer, self.sections[SECTION_BODIES][0])
+
+    def doc_id_at(self, number):
+        """Decodifica apenas o doc_id (caminho) do documento de id inteiro number"""
+        (start,) = DOC_OFFSET.unpack_from(self.buffer, self._doc_offsets + number * DOC_OFFSET.size)
+        doc_id, _ = _decode_string(self.buffer, self._doc_records + start)
+        return doc_id
+
+    def document_at(self, number):
+        """Decodifica o registro do documento de id inteiro number, sem o conteúdo"""
+        (start,) = DOC_OFFSET.unpack_from(self.buffer, self._doc_offsets + number * DOC_OFFSET.size)
+        pos = self._doc_records + start
+
+        doc_id, pos = _decode_string(self.buffer, pos)
+        title, pos = _decode_string(self.buffer, pos)
+        category, pos = _decode_string(self.buffer, pos)
+        path, pos = _decode_string(self.buffer, pos)
+        if self.bodies is None:
+            # Conteúdo embutido (versões 2 e 3): apenas pulado
+            content_length, pos = decode_varint(self.buffer, pos)
+            pos += content_length
+        length, pos = decode_varint(self.buffer, pos)
+
+        document = {'title': title, 'category': category, 'path': path}
+        return doc_id, document, length
+
+    def content_at(self, number):
+        """Conteúdo do documento de id inteiro number"""
+        if self.bodies is not None:
+            return self.bodies.get(number)
+
+        (start,) = DOC_OFFSET.unpack_from(self.buffer, self._doc_offsets + number * DOC_OFFSET.size)
+        pos = self._doc_records + start
+        for _ in range(4):  # doc_id, título, categoria e caminho
+            length, pos = decode_varint(self.buffer, pos)
+            pos += length
+        content, _ = _decode_string(self.buffer, pos)
+        return content
+
+    def positions_at(self, number):
+        """Retorna {número do termo: posições codificadas} do documento de id inteiro number"""
+        (start,) = DOC_OFFSET.unpack_from(self.buffer, self._position_offsets + number * DOC_OFFSET.size)
+        buffer = self.buffer
+        pos = self._position_records + start
+
+        count, pos = decode_varint(buffer, pos)
+        stored = {}
+        term_number = 0
+        for _ in range(count):
+            delta, pos = decode_varint(buffer, pos)
+            length, pos = decode_varint(buffer, pos)
+            term_number += delta
+            stored[term_number] = bytes(buffer[pos:pos + length])
+            pos += length
+        return stored
+
+    def term_entry(self, i):
+        """Retorna (termo, offset da posting, tamanho, df, frequência no corpus, soma dos quadrados)"""
+        (text_start, text_len, post_start, post_len,
+         doc_freq, corpus_freq, sq_freq) = TERM_ENTRY.unpack_from(
+            self.buffer, self._term_entries + i * TERM_ENTRY.size)
+        start = self._term_text + text_start
+        term = bytes(self.buffer[start:start + text_len]).decode('utf-8')
+        return term, post_start, post_len, doc_freq, corpus_freq, sq_freq
+
+    def _term_bytes(self, i):
+        text_start, text_len = struct.unpack_from(
+            '<IH', self.buffer, self._term_entries + i * TERM_ENTRY.size)
+        start = self._term_text + text_start
+        return bytes(self.buffer[start:start + text_len])
+
+    def find_term(self, term):
+        """Busca binária no dicionário; retorna a posição do termo ou -1"""
+        target = term.encode('utf-8')
+        low, high = 0, self.term_count - 1
+
+        while low <= high:
+            middle = (low + high) // 2
+            current = self._term_bytes(middle)
+
+            if current == target:
+                return middle
+            if current < target:
+                low = middle + 1
+            else:
+                high = middle - 1
+
+        return -1
+
+    def terms_with_prefix(self, prefix):
+        """Gera, em ordem, os termos do dicionário que começam com prefix"""
+        target = prefix.encode('utf-8')
+
+        # Primeira posição com termo >= prefix; os termos com o prefixo são
+        # um intervalo contíguo a partir dela
+        low, high = 0, self.term_count
+        while low < high:
+            middle = (low + high) // 2
+            if self._term_bytes(middle) < target:
+                low = middle + 1
+            else:
+                high = middle
+
+        for i in range(low, self.term_count):
+            current = self._term_bytes(i)
+            if not current.startswith(target):
+                break
+            yield current.decode('utf-8')
+
+    def postings(self, post_start, doc_freq):
+        """Decodifica a lista de um termo em arrays paralelos (ids inteiros, tfs)"""
+        buffer = self.buffer
+        pos = self._postings + post_start
+        ids = array('I')
+        tfs = array('I')
+        number = 0
+
+        for _ in range(doc_freq):
+            # Caminho rápido: a maioria dos valores cabe em um único byte
+            delta = buffer[pos]
+            if delta < 0x80:
+                pos += 1
+            else:
+                delta, pos = decode_varint(buffer, pos)
+
+            freq = buffer[pos]
+            if freq < 0x80:
+                pos += 1
+            else:
+                freq, pos = decode_varint(buffer, pos)
+
+            number += delta
+            ids.append(number)
+            tfs.append(freq)
+
+        return ids, tfs
+
+
+def load_binary_index(index, path):
+    """Carrega um índice binário, preenchendo as estruturas do InvertedIndex"""
+    with open(path, 'rb') as f:
+        reader = IndexFileReader(f.read())
+
+    documents = {}
+    doc_lengths = {}
+    doc_ids = []
+
+    for number in range(reader.doc_count):
+        doc_id, document, length = reader.document_at(number)
+        documents[doc_id] = document
+        doc_lengths[doc_id] = length
+        doc_ids.append(doc_id)
+
+    # Os corpos continuam comprimidos: só a seção BODIES é copiada do arquivo
+    if reader.bodies is not None:
+        offset, size = reader.sections[SECTION_BODIES]
+        bodies = DocumentStore.from_buffer(reader.buffer[offset:offset + size])
+    else:
+        bodies = DocumentStore()
+        for number in range(reader.doc_count):
+            bodies.append(reader.content_at(number))
+
+    corpus_term_freq = {}
+    doc_freq = {}
+    term_sq_freq = {}
+    term_postings = []
+    terms = []
+
+    for i in range(reader.term_count):
+        term, post_start, _, df, corpus_freq, sq_freq = reader.term_entry(i)
+        terms.append(term)
+        corpus_term_freq[term] = corpus_freq
+        doc_freq[term] = df
+        term_sq_freq[term] = sq_freq
+
+        # As postings do arquivo já estão no formato em memória
+        term_postings.append((term, PostingList(*reader.postings(post_start, df)).optimize(reader.doc_count)))
+
+    # O dicionário do arquivo está ordenado por bytes UTF-8, que é a mesma
+    # ordem das strings: a Trie é construída em lote
+    trie = CompactTrie.from_sorted(term_postings, PostingList)
+
+    index.trie = trie
+    index.documents = documents
+    index.bodies = bodies
+    index.doc_ids = doc_ids
+    index.doc_numbers = {doc_id: number for number, doc_id in enumerate(doc_ids)}
+    index.doc_lengths = doc_lengths
+    index.corpus_term_freq = corpus_term_freq
+    index.doc_freq = doc_freq
+    index.term_sq_freq = term_sq_freq
+    index.total_docs = reader.total_docs
+
+    # Arquivos com posições tornam o índice posicional; um índice posicional
+    # carregado de um arquivo sem elas as recalcula a partir do conteúdo
+    index.positions = {}
+    if reader.has_positions:
+        index.positional = True
+        for number in range(reader.doc_count):
+            index.positions[number] = {terms[term_number]: data for term_number, data
+                                       in reader.positions_at(number).items()}
+    elif index.positional:
+        index.build_positions()
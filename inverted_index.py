@@ -6,116 +6,450 @@ Utiliza a Trie Compacta para armazenar o índice invertido dos documentos.
 import os
 import re
 import json
+import math
+import threading
+from array import array
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
 from compact_trie import CompactTrie
+from document_store import DocumentStore
+from postings import PostingList, PostingView, PostingCache
+from suggester import Suggester
+from index_storage import (save_binary_index, load_binary_index, is_binary_index,
+                           encode_positions, decode_positions)
+
+
+# Tokens: sequências de letras e números (o texto já em minúsculas)
+TOKEN_PATTERN = re.compile(r'\b[a-z0-9]+\b')
+
+
+def term_statistics(total_term_freq, sq_freq, doc_freq, total_docs):
+    """Calcula (média, desvio padrão, df) a partir das somas de frequência do termo"""
+    if total_term_freq == 0 or total_docs == 0:
+        return 0.0, 0.0, 0
+    
+    mean_freq = total_term_freq / total_docs
+    
+    # Var = (N * soma(f^2) - soma(f)^2) / N^2, numerador inteiro e exato
+    numerator = total_docs * sq_freq - total_term_freq * total_term_freq
+    std_dev = math.sqrt(numerator) / total_docs if numerator > 0 else 0.0
+    
+    return mean_freq, std_dev, doc_freq
+
+
+def term_positions(tokens, terms=None):
+    """Agrupa os tokens (termo, offset) em {termo: (posições, offsets)}; com terms, só desses termos"""
+    grouped = {}
+    for position, (term, offset) in enumerate(tokens):
+        if terms is None or term in terms:
+            entry = grouped.get(term)
+            if entry is None:
+                grouped[term] = entry = ([], [])
+            entry[0].append(position)
+            entry[1].append(offset)
+    return grouped
+
+
+def encode_document_positions(tokens):
+    """{termo: posições codificadas} de um documento, no formato guardado pelo índice posicional"""
+    return {term: encode_positions(positions, offsets)
+            for term, (positions, offsets) in term_positions(tokens).items()}
 
 
 class InvertedIndex:
-    def __init__(self):
-        self.trie = CompactTrie()
-        self.documents = {}  # {doc_id: {'title': str, 'content': str, 'category': str, 'path': str}}
-        self.term_frequencies = {}  # {doc_id: {term: frequency}}
+    def __init__(self, positional=False):
+        self.trie = CompactTrie(PostingList)  # {term: PostingList de (id inteiro, frequência)}
+        self.documents = {}  # {doc_id: {'title': str, 'category': str, 'path': str}}
+        self.bodies = DocumentStore()  # conteúdo dos documentos, comprimido, pelo id inteiro
+        self.doc_ids = []  # {id inteiro: doc_id}, None para documentos removidos
+        self.doc_numbers = {}  # {doc_id: id inteiro}
         self.doc_lengths = {}  # {doc_id: número de termos}
         self.corpus_term_freq = {}  # {term: frequência total no corpus}
+        self.doc_freq = {}  # {term: número de documentos que contêm o termo}
+        self.term_sq_freq = {}  # {term: soma dos quadrados das frequências por documento}
         self.total_docs = 0
+        self.pending_changes = []  # alterações ainda não gravadas no journal
+        self.version = 0  # incrementada a cada alteração (invalida caches de consultas)
+        self.posting_cache = PostingCache()  # {term: PostingView} dos termos consultados
+        self._suggester = None  # Suggester montado na primeira sugestão
+        self._suggest_changes = set()  # termos alterados desde a última sugestão
+        self._suggest_lock = threading.Lock()
+        
+        # Índice posicional: posições dos tokens e offsets no conteúdo de cada
+        # termo de cada documento, usados por consultas de frase e snippets
+        self.positional = positional
+        self.positions = {}  # {id inteiro: {term: posições codificadas}}
     
-    def index_documents(self, corpus_path):
+    def index_documents(self, corpus_path, workers=1):
         print("Iniciando indexação dos documentos...")
         
+        categories = [category for category in os.listdir(corpus_path)
+                      if os.path.isdir(os.path.join(corpus_path, category))]
+        tasks = [(corpus_path, category, self.positional) for category in categories]
+        
+        # Leitura e tokenização das categorias podem rodar em paralelo; a
+        # junção abaixo segue sempre a ordem sequencial, então o índice
+        # resultante é idêntico ao da indexação em um único processo
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                partials = list(executor.map(_read_category, tasks))
+        else:
+            partials = map(_read_category, tasks)
+        
+        # Postings de todas as categorias, na ordem em que os termos aparecem
+        term_postings = {}
+        
         # Itera por todas as categorias (pastas)
-        for category in os.listdir(corpus_path):
-            category_path = os.path.join(corpus_path, category)
-            
-            if not os.path.isdir(category_path):
-                continue
-            
+        for category, partial in zip(categories, partials):
             print(f"Processando categoria: {category}")
-            
-            # Itera por todos os documentos da categoria
-            for filename in os.listdir(category_path):
-                if not filename.endswith('.txt'):
-                    continue
-                
-                doc_path = os.path.join(category_path, filename)
-                doc_id = f"{category}/{filename}"
-                
-                # Lê o documento
-                with open(doc_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    content = f.read()
-                
-                # Primeira linha é o título
-                lines = content.split('\n', 1)
-                title = lines[0].strip() if lines else ""
-                content = lines[1] if len(lines) > 1 else ""
-                
-                # Armazena informações do documento
-                self.documents[doc_id] = {
-                    'title': title,
-                    'content': content,
-                    'category': category,
-                    'path': doc_path
-                }
-                
-                # Processa e indexa os termos
-                terms = self._tokenize(content)
-                self._index_document_terms(doc_id, terms)
-                
-                self.total_docs += 1
+            self._merge_partial(partial, term_postings)
+        
+        # Cada termo entra uma única vez na Trie com todos os documentos;
+        # optimize escolhe a representação (bitmap para termos densos)
+        for postings in term_postings.values():
+            postings.optimize(len(self.doc_ids))
+        
+        if self.trie.root.children:
+            # Os ids novos vêm depois de todos os já atribuídos: listas de
+            # termos já indexados só crescem no final
+            for term, postings in term_postings.items():
+                existing = self.trie.setdefault(term, postings)
+                if existing is not postings:
+                    existing.ids.extend(postings.ids)
+                    existing.tfs.extend(postings.tfs)
+                    existing.optimize(len(self.doc_ids))
+        else:
+            # Trie vazia: construção em lote a partir dos termos ordenados
+            self.trie = CompactTrie.from_sorted(sorted(term_postings.items()), PostingList)
+        
+        self.version += 1
+        self.posting_cache.clear()
+        self._suggester = None
         
         print(f"Indexação concluída! Total de documentos: {self.total_docs}")
         print(f"Total de termos únicos: {len(self.corpus_term_freq)}")
     
-    def _tokenize(self, text):
+    def _merge_partial(self, partial, term_postings):
+        """Junta o índice parcial de uma categoria às estruturas do índice"""
+        documents, partial_postings, partial_stats = partial
+        
+        # Ids locais do parcial são deslocados para depois dos já atribuídos
+        base = len(self.doc_ids)
+        for doc_id, document, length, positions in documents:
+            content = document.pop('content')
+            self.documents[doc_id] = document
+            number = self._assign_number(doc_id)
+            self.bodies.put(number, content)
+            self.doc_lengths[doc_id] = length
+            if positions is not None:
+                self.positions[number] = positions
+            self.total_docs += 1
+        
+        for term, (total_freq, doc_freq, sq_freq) in partial_stats.items():
+            self.corpus_term_freq[term] = self.corpus_term_freq.get(term, 0) + total_freq
+            self.doc_freq[term] = self.doc_freq.get(term, 0) + doc_freq
+            self.term_sq_freq[term] = self.term_sq_freq.get(term, 0) + sq_freq
+        
+        for term, (local_ids, tfs) in partial_postings.items():
+            ids = array('I', [base + local_id for local_id in local_ids]) if base else local_ids
+            
+            if term in term_postings:
+                term_postings[term].ids.extend(ids)
+                term_postings[term].tfs.extend(tfs)
+            else:
+                term_postings[term] = PostingList(ids, tfs)
+    
+    def _assign_number(self, doc_id):
+        number = len(self.doc_ids)
+        self.doc_ids.append(doc_id)
+        self.doc_numbers[doc_id] = number
+        return number
+    
+    @staticmethod
+    def _tokenize(text):
         # Remove pontuação e converte para minúsculas
         text = text.lower()
         # Mantém apenas letras e números
-        tokens = re.findall(r'\b[a-z0-9]+\b', text)
+        tokens = TOKEN_PATTERN.findall(text)
         return tokens
     
-    def _index_document_terms(self, doc_id, terms):
+    @staticmethod
+    def _tokenize_with_offsets(text):
+        # Mesmos tokens de _tokenize, com o offset de cada um no texto
+        return [(match.group(), match.start()) for match in TOKEN_PATTERN.finditer(text.lower())]
+    
+    @staticmethod
+    def _count_terms(terms):
         # Conta a frequência dos termos
         term_freq = {}
         for term in terms:
             term_freq[term] = term_freq.get(term, 0) + 1
-        
-        self.term_frequencies[doc_id] = term_freq
-        self.doc_lengths[doc_id] = len(terms)
+        return term_freq
+    
+    def _index_document_terms(self, doc_id, terms):
+        self._add_document_terms(doc_id, self._count_terms(terms), len(terms))
+    
+    def _add_document_terms(self, doc_id, term_freq, length):
+        number = self._assign_number(doc_id)
+        self.doc_lengths[doc_id] = length
+        self.posting_cache.invalidate(term_freq)
+        self._record_suggest_changes(term_freq)
         
         # Insere cada termo único na Trie
-        for term in term_freq.keys():
-            self.trie.insert(term, doc_id)
-            self.corpus_term_freq[term] = self.corpus_term_freq.get(term, 0) + term_freq[term]
+        for term, freq in term_freq.items():
+            self.trie.setdefault(term).add(number, freq)
+            self.corpus_term_freq[term] = self.corpus_term_freq.get(term, 0) + freq
+            self.doc_freq[term] = self.doc_freq.get(term, 0) + 1
+            self.term_sq_freq[term] = self.term_sq_freq.get(term, 0) + freq * freq
+    
+    def add_document(self, doc_id, title, content, category, path=""):
+        """Indexa um novo documento (ou substitui um existente) sem reconstruir o índice"""
+        if doc_id in self.documents:
+            self.remove_document(doc_id)
+        
+        self.documents[doc_id] = {
+            'title': title,
+            'category': category,
+            'path': path
+        }
+        if self.positional:
+            tokens = self._tokenize_with_offsets(content)
+            self._index_document_terms(doc_id, [term for term, _ in tokens])
+            self.positions[self.doc_numbers[doc_id]] = encode_document_positions(tokens)
+        else:
+            self._index_document_terms(doc_id, self._tokenize(content))
+        self.bodies.put(self.doc_numbers[doc_id], content)
+        self.total_docs += 1
+        self.version += 1
+        
+        self.pending_changes.append({'op': 'add', 'doc_id': doc_id, 'title': title,
+                                     'content': content, 'category': category, 'path': path})
+    
+    def update_document(self, doc_id, title, content, category, path=""):
+        """Substitui o conteúdo de um documento já indexado"""
+        if doc_id not in self.documents:
+            raise KeyError(doc_id)
+        
+        self.add_document(doc_id, title, content, category, path)
+    
+    def remove_document(self, doc_id):
+        """Remove o documento da Trie e ajusta as estatísticas do corpus"""
+        if doc_id not in self.documents:
+            return False
+        
+        term_freq = self.get_document_terms(doc_id)
+        number = self.doc_numbers.pop(doc_id)
+        self.posting_cache.invalidate(term_freq)
+        self._record_suggest_changes(term_freq)
+        
+        for term, freq in term_freq.items():
+            self.trie.remove(term, number)
+            
+            self.doc_freq[term] = self.doc_freq.get(term, 0) - 1
+            if self.doc_freq[term] <= 0:
+                # Termo não aparece em mais nenhum documento
+                self.corpus_term_freq.pop(term, None)
+                self.doc_freq.pop(term, None)
+                self.term_sq_freq.pop(term, None)
+            else:
+                self.corpus_term_freq[term] -= freq
+                self.term_sq_freq[term] -= freq * freq
+        
+        del self.documents[doc_id]
+        self.doc_ids[number] = None
+        self.positions.pop(number, None)
+        self.doc_lengths.pop(doc_id, None)
+        self.total_docs -= 1
+        self.version += 1
+        
+        self.pending_changes.append({'op': 'remove', 'doc_id': doc_id})
+        return True
+    
+    def get_document_terms(self, doc_id):
+        """Frequências dos termos de um documento, recalculadas a partir do conteúdo"""
+        content = self.get_content(doc_id)
+        if content is None:
+            return {}
+        return self._count_terms(self._tokenize(content))
+    
+    def build_positions(self):
+        """Torna o índice posicional, calculando as posições de todos os documentos"""
+        self.positional = True
+        self.positions = {}
+        for number, doc_id in enumerate(self.doc_ids):
+            if doc_id is not None:
+                tokens = self._tokenize_with_offsets(self.bodies.read(number))
+                self.positions[number] = encode_document_positions(tokens)
+    
+    def get_term_positions(self, doc_id, terms):
+        """Retorna {termo: (posições, offsets)} dos termos que aparecem no documento.
+
+        posições são os índices dos tokens e offsets os caracteres de início
+        no conteúdo. Sem posições gravadas (índice não posicional), elas são
+        recalculadas a partir do conteúdo.
+        """
+        number = self.doc_numbers.get(doc_id)
+        if number is None:
+            return {}
+        
+        stored = self.positions.get(number)
+        if stored is None:
+            tokens = self._tokenize_with_offsets(self.bodies.get(number))
+            return term_positions(tokens, set(terms))
+        return {term: decode_positions(stored[term]) for term in terms if term in stored}
     
     def search_term(self, term):
-        return self.trie.search(term)
+        # Lista somente leitura compartilhada: sem caminhar na Trie nem copiar
+        # a cada consulta. A chave é minúscula, como as invalidadas pelas alterações
+        return self.posting_cache.get(term.lower(), self._load_postings)
+    
+    def _load_postings(self, term):
+        postings = self.trie.get(term)
+        if postings is None:
+            return PostingView()
+        return postings.freeze()
+    
+    def get_doc_id(self, number):
+        return self.doc_ids[number]
+    
+    def suggest(self, prefix, k=10):
+        """Retorna [(termo, frequência)] dos k termos mais frequentes com o prefixo.
+
+        O Suggester é montado na primeira sugestão; depois de add_document e
+        remove_document, apenas os termos alterados são atualizados.
+        """
+        # O lock impede que uma consulta leia a Trie enquanto outra a atualiza
+        with self._suggest_lock:
+            if self._suggester is None:
+                self._suggester = Suggester(sorted(self.corpus_term_freq.items()))
+                self._suggest_changes = set()
+            elif self._suggest_changes:
+                self._suggester.update({term: self.corpus_term_freq.get(term, 0)
+                                        for term in self._suggest_changes})
+                self._suggest_changes = set()
+            return self._suggester.suggest(prefix, k)
+    
+    def _record_suggest_changes(self, terms):
+        # Sem Suggester montado não há o que atualizar: ele nasce da contagem atual
+        if self._suggester is not None:
+            self._suggest_changes.update(terms)
+    
+    def expand_prefix(self, prefix, limit=None):
+        """Termos do vocabulário que começam com prefix, em ordem alfabética.
+
+        A subárvore do prefixo é percorrida uma vez e para depois de limit
+        termos.
+        """
+        terms = (term for term, postings in self.trie.iter_prefix(prefix) if postings)
+        return list(islice(terms, limit))
+    
+    def expand_fuzzy(self, term, max_edits, limit=None):
+        """Termos do vocabulário a no máximo max_edits edições de term.
+
+        Ordenados do mais próximo para o mais distante (empates em ordem
+        alfabética) e cortados em limit.
+        """
+        matches = sorted((distance, word) for word, postings, distance
+                         in self.trie.fuzzy_search(term, max_edits) if postings)
+        return [word for _, word in matches[:limit]]
+    
+    def iter_postings(self):
+        """Gera (termo, postings, média, desvio padrão) de todo o vocabulário, em ordem alfabética"""
+        for term, postings in self.trie.iter_prefix(""):
+            if postings:
+                mean_freq, std_dev, _ = self.get_term_statistics(term)
+                yield term, postings, mean_freq, std_dev
     
     def get_term_frequency(self, doc_id, term):
+        number = self.doc_numbers.get(doc_id)
+        postings = self.trie.get(term)
+        if number is None or postings is None:
+            return 0
+        return postings.frequency(number)
+    
+    def get_term_statistics(self, term):
+        """Retorna (média, desvio padrão, frequência de documentos) do termo no corpus.
+
+        Média e variância são derivadas das somas mantidas na indexação, então
+        o custo é O(1) e o resultado continua correto quando documentos são
+        adicionados (total_docs muda, as somas são apenas incrementadas).
+        """
         term = term.lower()
-        if doc_id in self.term_frequencies:
-            return self.term_frequencies[doc_id].get(term, 0)
-        return 0
+        return term_statistics(self.corpus_term_freq.get(term, 0),
+                               self.term_sq_freq.get(term, 0),
+                               self.doc_freq.get(term, 0),
+                               self.total_docs)
+    
+    def get_document(self, doc_id, content=True):
+        """Metadados do documento com o conteúdo (lido do armazenamento de documentos), ou só os metadados"""
+        document = self.documents.get(doc_id)
+        if document is None:
+            return None
+        if not content:
+            return dict(document)
+        return dict(document, content=self.bodies.get(self.doc_numbers[doc_id]))
     
-    def get_document(self, doc_id):
-        return self.documents.get(doc_id)
+    def get_content(self, doc_id):
+        """Apenas o conteúdo do documento, ou None se ele não existir"""
+        number = self.doc_numbers.get(doc_id)
+        if number is None:
+            return None
+        return self.bodies.get(number)
     
     def save_index(self, index_path):
         print(f"Salvando índice em {index_path}...")
         
-        # Serializa a estrutura completa
-        index_data = {
-            'trie': self.trie.to_dict(),
-            'documents': self.documents,
-            'term_frequencies': self.term_frequencies,
-            'doc_lengths': self.doc_lengths,
-            'corpus_term_freq': self.corpus_term_freq,
-            'total_docs': self.total_docs
-        }
+        # Formato binário compacto (ver index_storage)
+        save_binary_index(self, index_path)
         
-        # Salva em formato JSON
-        with open(index_path, 'w', encoding='utf-8') as f:
-            json.dump(index_data, f, ensure_ascii=False, indent=2)
+        # O arquivo completo já contém as alterações do journal
+        if os.path.exists(self.delta_path(index_path)):
+            os.remove(self.delta_path(index_path))
+        self.pending_changes = []
         
         print("Índice salvo com sucesso!")
     
+    def save_delta(self, index_path):
+        """Grava apenas as alterações pendentes no journal ao lado do índice"""
+        if not self.pending_changes:
+            return 0
+        
+        # Uma alteração por linha; o journal só cresce até o próximo save_index
+        with open(self.delta_path(index_path), 'a', encoding='utf-8') as f:
+            for change in self.pending_changes:
+                f.write(json.dumps(change, ensure_ascii=False) + '\n')
+        
+        saved = len(self.pending_changes)
+        self.pending_changes = []
+        return saved
+    
+    @staticmethod
+    def delta_path(index_path):
+        return index_path + '.delta'
+    
+    def _replay_delta(self, index_path):
+        delta_path = self.delta_path(index_path)
+        if not os.path.exists(delta_path):
+            return 0
+        
+        replayed = 0
+        with open(delta_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                
+                change = json.loads(line)
+                if change['op'] == 'add':
+                    self.add_document(change['doc_id'], change['title'], change['content'],
+                                      change['category'], change['path'])
+                elif change['op'] == 'remove':
+                    self.remove_document(change['doc_id'])
+                replayed += 1
+        
+        # Alterações reaplicadas já estão gravadas no journal
+        self.pending_changes = []
+        return replayed
+    
     def load_index(self, index_path):
         if not os.path.exists(index_path):
             return False
@@ -123,16 +457,18 @@ class InvertedIndex:
         print(f"Carregando índice de {index_path}...")
         
         try:
-            with open(index_path, 'r', encoding='utf-8') as f:
-                index_data = json.load(f)
+            if is_binary_index(index_path):
+                load_binary_index(self, index_path)
+            else:
+                self._load_json_index(index_path)
+            self.posting_cache.clear()
+            self._suggester = None
             
-            # Reconstrói a Trie
-            self.trie = CompactTrie.from_dict(index_data['trie'])
-            self.documents = index_data['documents']
-            self.term_frequencies = index_data['term_frequencies']
-            self.doc_lengths = index_data['doc_lengths']
-            self.corpus_term_freq = index_data['corpus_term_freq']
-            self.total_docs = index_data['total_docs']
+            # Reaplica as alterações incrementais gravadas depois do último save_index
+            replayed = self._replay_delta(index_path)
+            self.version += 1
+            if replayed:
+                print(f"{replayed} alterações incrementais reaplicadas do journal")
             
             print(f"Índice carregado com sucesso! Total de documentos: {self.total_docs}")
             return True
@@ -141,6 +477,37 @@ class InvertedIndex:
             print(f"Erro ao carregar índice: {e}")
             return False
     
+    def _load_json_index(self, index_path):
+        # Formato JSON das versões anteriores, com doc_ids em texto
+        with open(index_path, 'r', encoding='utf-8') as f:
+            index_data = json.load(f)
+        
+        self.trie = CompactTrie(PostingList)
+        self.documents = {}
+        self.bodies = DocumentStore()
+        self.doc_ids = []
+        self.doc_numbers = {}
+        self.doc_lengths = {}
+        self.corpus_term_freq = {}
+        self.doc_freq = {}
+        self.term_sq_freq = {}
+        self.positions = {}
+        
+        # Reconstrói as postings com ids inteiros a partir das frequências
+        for doc_id, document in index_data['documents'].items():
+            content = document.pop('content', '')
+            self.documents[doc_id] = document
+            self._add_document_terms(doc_id, index_data['term_frequencies'].get(doc_id, {}),
+                                     index_data['doc_lengths'].get(doc_id, 0))
+            self.bodies.put(self.doc_numbers[doc_id], content)
+        
+        for term in self.corpus_term_freq:
+            self.trie.get(term).optimize(len(self.doc_ids))
+        
+        self.total_docs = index_data['total_docs']
+        if self.positional:
+            self.build_positions()
+    
     def get_statistics(self):
         return {
             'total_documents': self.total_docs,
@@ -148,3 +515,79 @@ class InvertedIndex:
             'total_terms': sum(self.corpus_term_freq.values()),
             'avg_doc_length': sum(self.doc_lengths.values()) / self.total_docs if self.total_docs > 0 else 0
         }
+
+
+def _read_category(task):
+    """Lê e tokeniza os documentos de uma categoria, produzindo um índice parcial.
+
+    Função de módulo para poder ser executada em um ProcessPoolExecutor.
+    """
+    corpus_path, category, positional = task
+    category_path = os.path.join(corpus_path, category)
+    documents = []
+    
+    # Itera por todos os documentos da categoria
+    for filename in os.listdir(category_path):
+        if not filename.endswith('.txt'):
+            continue
+        
+        doc_path = os.path.join(category_path, filename)
+        doc_id = f"{category}/{filename}"
+        
+        # Lê o documento
+        with open(doc_path, 'r', encoding='utf-8', errors='ignore') as f:
+            content = f.read()
+        
+        # Primeira linha é o título
+        lines = content.split('\n', 1)
+        title = lines[0].strip() if lines else ""
+        content = lines[1] if len(lines) > 1 else ""
+        
+        # Armazena informações do documento
+        document = {
+            'title': title,
+            'content': content,
+            'category': category,
+            'path': doc_path
+        }
+        
+        # Processa os termos
+        if positional:
+            tokens = InvertedIndex._tokenize_with_offsets(content)
+            terms = [term for term, _ in tokens]
+            positions = encode_document_positions(tokens)
+        else:
+            terms = InvertedIndex._tokenize(content)
+            positions = None
+        documents.append((doc_id, document, InvertedIndex._count_terms(terms), len(terms), positions))
+    
+    return build_partial_index(documents)
+
+
+def build_partial_index(documents):
+    """Monta um índice parcial a partir de (doc_id, documento, frequências, tamanho, posições).
+
+    posições é o resultado de encode_document_positions, ou None fora do
+    índice posicional. Retorna (documentos, postings por termo, estatísticas
+    por termo), no formato aceito por InvertedIndex._merge_partial. Os
+    documentos perdem as frequências, as postings usam ids locais (posição na lista) e as
+    estatísticas são tuplas (frequência total, df, soma dos quadrados).
+    """
+    term_postings = {}
+    term_stats = {}
+    
+    for local_id, (_, _, term_freq, _, _) in enumerate(documents):
+        for term, freq in term_freq.items():
+            if term in term_stats:
+                total_freq, doc_freq, sq_freq = term_stats[term]
+                term_stats[term] = (total_freq + freq, doc_freq + 1, sq_freq + freq * freq)
+                ids, tfs = term_postings[term]
+                ids.append(local_id)
+                tfs.append(freq)
+            else:
+                term_stats[term] = (freq, 1, freq * freq)
+                term_postings[term] = (array('I', [local_id]), array('I', [freq]))
+    
+    documents = [(doc_id, document, length, positions)
+                 for doc_id, document, _, length, positions in documents]
+    return documents, term_postings, term_stats
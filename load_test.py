@@ -0,0 +1,108 @@
+"""
+Teste de Carga do Servidor
+Mede a vazão de /api/search com clientes concorrentes, variando o número de
+processos de pontuação do servidor (server.py).
+
+Para cada configuração um servidor é iniciado em um subprocesso, sobre o
+índice salvo (index.bin), e recebe consultas distintas (OR de dois termos
+frequentes, obtidos de /api/suggest), para que o QueryCache não responda
+no lugar da avaliação.
+
+Uso: python load_test.py [processos ...]   (padrão: 0 1 2 4)
+"""
+
+import json
+import os
+import random
+import string
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+from urllib.request import urlopen
+
+
+PORT = 5100
+SERVER_THREADS = 8
+CLIENTS = 16  # requisições simultâneas
+REQUESTS = 400  # requisições por configuração
+STARTUP_TIMEOUT = 120  # segundos
+
+
+def fetch(url):
+    with urlopen(url, timeout=60) as response:
+        return json.loads(response.read())
+
+
+def wait_ready(base_url, server):
+    """Espera o servidor responder /api/stats"""
+    deadline = time.time() + STARTUP_TIMEOUT
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("Servidor terminou antes de ficar pronto")
+        try:
+            return fetch(f"{base_url}/api/stats")
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("Servidor não ficou pronto")
+
+
+def build_queries(base_url, count, seed=0):
+    """count consultas distintas "a OR b" com termos frequentes do índice"""
+    terms = []
+    for first in string.ascii_lowercase:
+        for second in string.ascii_lowercase:
+            data = fetch(f"{base_url}/api/suggest?prefix={first}{second}")
+            terms.extend(entry['term'] for entry in data['suggestions'])
+
+    rng = random.Random(seed)
+    queries = set()
+    while len(queries) < count:
+        queries.add(' OR '.join(sorted(rng.sample(terms, 2))))
+    return sorted(queries)
+
+
+def run_load(base_url, queries):
+    """(requisições/s, latência p50, latência p95) com CLIENTS clientes simultâneos"""
+    def request(query):
+        start = time.perf_counter()
+        fetch(f"{base_url}/api/search?{urlencode({'q': query})}")
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=CLIENTS) as executor:
+        latencies = sorted(executor.map(request, queries))
+    elapsed = time.perf_counter() - start
+
+    p50 = latencies[len(latencies) // 2]
+    p95 = latencies[int(len(latencies) * 0.95)]
+    return len(queries) / elapsed, p50 * 1000, p95 * 1000
+
+
+def main():
+    configurations = [int(arg) for arg in sys.argv[1:]] or [0, 1, 2, 4]
+    base_url = f"http://127.0.0.1:{PORT}"
+
+    print(f"CPUs: {os.cpu_count()}  threads do servidor: {SERVER_THREADS}  "
+          f"clientes: {CLIENTS}  requisições: {REQUESTS}")
+    print(f"{'processos':>9} {'req/s':>9} {'p50 (ms)':>9} {'p95 (ms)':>9}")
+
+    for processes in configurations:
+        server = subprocess.Popen(
+            [sys.executable, 'server.py', '--port', str(PORT), '--threads', str(SERVER_THREADS),
+             '--processes', str(processes)],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_ready(base_url, server)
+            # Mesmas consultas em todas as configurações; cada servidor começa com o cache vazio
+            queries = build_queries(base_url, REQUESTS)
+            throughput, p50, p95 = run_load(base_url, queries)
+            print(f"{processes:>9} {throughput:>9.1f} {p50:>9.1f} {p95:>9.1f}")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
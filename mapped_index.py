@@ -0,0 +1,166 @@
+"""
+Módulo de Índice Mapeado em Memória
+Leitura somente-leitura do índice binário via mmap, decodificando sob demanda.
+
+Vários processos (por exemplo, workers do gunicorn) que abrem o mesmo arquivo
+compartilham as páginas do cache do sistema operacional, em vez de manter
+cada um uma cópia privada de documents e das postings. Apenas os
+caminhos dos documentos (para get_document) e as postings dos termos
+consultados recentemente ficam em memória do processo.
+"""
+
+import mmap
+from functools import lru_cache
+from itertools import islice
+from compact_trie import CompactTrie
+from index_storage import IndexFileReader, decode_positions
+from postings import PostingView
+from suggester import Suggester
+from inverted_index import InvertedIndex, term_statistics, term_positions
+
+
+class MappedIndex:
+    def __init__(self, index_path, cache_size=1024):
+        with open(index_path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        
+        self.reader = IndexFileReader(self._mmap)
+        self.total_docs = self.reader.total_docs
+        self.version = 0  # o arquivo mapeado nunca muda
+        
+        # Tabela caminho -> id inteiro, montada no primeiro acesso
+        self._doc_numbers = None
+        
+        self._suggester = None  # montado na primeira sugestão
+        self._vocabulary = None  # FrozenTrie dos termos, montada na primeira busca aproximada
+        
+        # Postings decodificadas dos termos mais usados (lru_cache é thread-safe)
+        self._term_entry = lru_cache(maxsize=cache_size)(self._decode_term)
+        
+        # Posições dos documentos consultados recentemente, se o arquivo as tiver
+        self._term_number = lru_cache(maxsize=cache_size)(self.reader.find_term)
+        self._document_positions = None
+        if self.reader.has_positions:
+            self._document_positions = lru_cache(maxsize=cache_size)(self.reader.positions_at)
+    
+    def _decode_term(self, term):
+        position = self.reader.find_term(term)
+        if position < 0:
+            return None
+        
+        _, post_start, _, doc_freq, corpus_freq, sq_freq = self.reader.term_entry(position)
+        postings = PostingView(*self.reader.postings(post_start, doc_freq)).optimize(self.reader.doc_count)
+        return postings, doc_freq, corpus_freq, sq_freq
+    
+    def _load_doc_numbers(self):
+        if self._doc_numbers is None:
+            self._doc_numbers = {self.reader.doc_id_at(number): number
+                                 for number in range(self.reader.doc_count)}
+        return self._doc_numbers
+    
+    def search_term(self, term):
+        # A lista decodificada é compartilhada pelo cache e nunca é alterada
+        entry = self._term_entry(term.lower())
+        if entry is None:
+            return PostingView()
+        return entry[0]
+    
+    def get_doc_id(self, number):
+        return self.reader.doc_id_at(number)
+    
+    def suggest(self, prefix, k=10):
+        """Retorna [(termo, frequência)] dos k termos mais frequentes com o prefixo"""
+        if self._suggester is None:
+            # O dicionário do arquivo já está ordenado
+            entries = (self.reader.term_entry(i) for i in range(self.reader.term_count))
+            self._suggester = Suggester((entry[0], entry[4]) for entry in entries)
+        return self._suggester.suggest(prefix, k)
+    
+    def expand_prefix(self, prefix, limit=None):
+        """Termos do dicionário que começam com prefix, em ordem alfabética"""
+        return list(islice(self.reader.terms_with_prefix(prefix.lower()), limit))
+    
+    def expand_fuzzy(self, term, max_edits, limit=None):
+        """Termos do dicionário a no máximo max_edits edições de term, dos mais próximos para os mais distantes"""
+        if self._vocabulary is None:
+            terms = ((word, ()) for word in self.reader.terms_with_prefix(""))
+            self._vocabulary = CompactTrie.from_sorted(terms, tuple).freeze()
+        
+        matches = sorted((distance, word) for word, _, distance
+                         in self._vocabulary.fuzzy_search(term, max_edits))
+        return [word for _, word in matches[:limit]]
+    
+    def iter_postings(self):
+        """Gera (termo, postings, média, desvio padrão) de todo o dicionário, sem passar pelo cache"""
+        for i in range(self.reader.term_count):
+            term, post_start, _, doc_freq, corpus_freq, sq_freq = self.reader.term_entry(i)
+            mean_freq, std_dev, _ = term_statistics(corpus_freq, sq_freq, doc_freq, self.total_docs)
+            yield term, PostingView(*self.reader.postings(post_start, doc_freq)), mean_freq, std_dev
+    
+    def get_term_frequency(self, doc_id, term):
+        entry = self._term_entry(term.lower())
+        if entry is None:
+            return 0
+        
+        number = self._load_doc_numbers().get(doc_id)
+        if number is None:
+            return 0
+        return entry[0].frequency(number)
+    
+    def get_term_positions(self, doc_id, terms):
+        """Retorna {termo: (posições, offsets)} dos termos que aparecem no documento"""
+        number = self._load_doc_numbers().get(doc_id)
+        if number is None:
+            return {}
+        
+        if self._document_positions is None:
+            # Arquivo sem posições: recalcula a partir do conteúdo
+            tokens = InvertedIndex._tokenize_with_offsets(self.reader.content_at(number))
+            return term_positions(tokens, set(terms))
+        
+        stored = self._document_positions(number)
+        result = {}
+        for term in terms:
+            data = stored.get(self._term_number(term))
+            if data is not None:
+                result[term] = decode_positions(data)
+        return result
+    
+    def get_term_statistics(self, term):
+        entry = self._term_entry(term.lower())
+        if entry is None:
+            return 0.0, 0.0, 0
+        
+        _, doc_freq, corpus_freq, sq_freq = entry
+        return term_statistics(corpus_freq, sq_freq, doc_freq, self.total_docs)
+    
+    def get_document(self, doc_id, content=True):
+        number = self._load_doc_numbers().get(doc_id)
+        if number is None:
+            return None
+        
+        _, document, _ = self.reader.document_at(number)
+        if content:
+            document['content'] = self.reader.content_at(number)
+        return document
+    
+    def get_content(self, doc_id):
+        number = self._load_doc_numbers().get(doc_id)
+        if number is None:
+            return None
+        return self.reader.content_at(number)
+    
+    def get_statistics(self):
+        return {
+            'total_documents': self.total_docs,
+            'unique_terms': self.reader.term_count,
+            'total_terms': self.reader.total_terms,
+            'avg_doc_length': self.reader.total_length / self.total_docs if self.total_docs > 0 else 0
+        }
+    
+    def close(self):
+        self._term_entry.cache_clear()
+        if self.reader.bodies is not None:
+            self.reader.bodies.get.cache_clear()
+        self.reader = None
+        self._mmap.close()
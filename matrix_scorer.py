@@ -0,0 +1,168 @@
+"""
+Módulo de Pontuação Vetorizada
+Calcula os z-scores de todos os candidatos de uma consulta com NumPy.
+
+As frequências ficam em uma matriz esparsa termo x documento no formato CSR
+(indptr, indices, data): a linha de um termo é a sua lista de postings, com
+os ids inteiros dos documentos em ordem crescente. Média e desvio padrão de
+cada termo ficam em vetores alinhados às linhas. O score de um conjunto de
+candidatos sai de algumas operações sobre arrays, e argpartition separa o
+top-k sem ordenar o resto.
+
+Os scores são somados termo a termo na ordem alfabética, com as mesmas
+operações de ponto flutuante de QueryProcessor._document_score, então são
+idênticos aos da avaliação em Python puro. Empates ficam com o menor id.
+
+NumPy é opcional: sem ele HAS_NUMPY é False e QueryProcessor continua
+pontuando documento a documento.
+
+Montar a matriz percorre todo o vocabulário. MatrixScorerCache guarda a
+matriz da versão atual do índice e, quando o índice muda, remonta a matriz
+em uma thread em segundo plano; até a nova matriz ficar pronta as consultas
+são pontuadas em Python, com os mesmos scores.
+"""
+
+import threading
+
+try:
+    import numpy as np
+except ImportError:  # NumPy é opcional
+    np = None
+
+from postings import PostingList
+
+
+HAS_NUMPY = np is not None
+
+
+class MatrixScorer:
+    def __init__(self, index):
+        """Monta a matriz a partir de index.iter_postings(), para a versão atual do índice"""
+        if np is None:
+            raise ImportError("MatrixScorer requer NumPy")
+
+        self.version = getattr(index, 'version', 0)
+        self.rows = {}  # {termo: linha da matriz}
+
+        indptr = [0]
+        indices = []
+        data = []
+        means = []
+        stds = []
+        for term, postings, mean_freq, std_dev in index.iter_postings():
+            if not postings:
+                continue
+            # Cópias dos arrays da Trie: uma view do NumPy exportaria o buffer
+            # e impediria add_document de aumentar a lista durante a montagem
+            ids = np.array(postings.ids[:], dtype=np.uint32)
+            tfs = np.array(postings.tfs[:len(ids)], dtype=np.uint32)
+            self.rows[term] = len(means)
+            indices.append(ids)
+            data.append(tfs)
+            indptr.append(indptr[-1] + len(ids))
+            means.append(mean_freq)
+            stds.append(std_dev)
+
+        self.indptr = np.array(indptr, dtype=np.int64)
+        self.indices = np.concatenate(indices) if indices else np.zeros(0, dtype=np.uint32)
+        self.data = np.concatenate(data) if data else np.zeros(0, dtype=np.uint32)
+        self.means = np.array(means, dtype=np.float64)
+        self.stds = np.array(stds, dtype=np.float64)
+        self.doc_count = int(self.indices.max()) + 1 if len(self.indices) else 0
+
+    def score(self, docs, query_terms):
+        """Retorna (candidatos, scores): ids de docs em ordem crescente e o score de cada um.
+
+        query_terms deve estar em ordem alfabética, com repetições, como em
+        QueryProcessor._term_data.
+        """
+        candidates = _candidate_array(docs)
+        z_sums = np.zeros(self.doc_count)
+
+        for term in query_terms:
+            row = self.rows.get(term)
+            if row is None or not self.stds[row]:
+                continue
+            start, end = self.indptr[row], self.indptr[row + 1]
+            # Os ids de uma linha são distintos, então a soma indexada é exata
+            z_sums[self.indices[start:end]] += (self.data[start:end] - self.means[row]) / self.stds[row]
+
+        size = len(query_terms)
+        scores = z_sums[candidates] / size if size else np.zeros(len(candidates))
+        return candidates, scores
+
+    def top_k(self, docs, query_terms, k):
+        """[(doc, score)] dos k maiores scores, do maior para o menor"""
+        candidates, scores = self.score(docs, query_terms)
+
+        if k < len(scores):
+            # argpartition acha o k-ésimo maior score; entre os empatados nele
+            # ficam os de menor id, como nos demais caminhos de top-k
+            kth = scores[np.argpartition(scores, len(scores) - k)[len(scores) - k]]
+            above = np.flatnonzero(scores > kth)
+            ties = np.flatnonzero(scores == kth)[:k - len(above)]
+            selected = np.concatenate((above, ties))
+        else:
+            selected = np.arange(len(scores))
+
+        order = selected[np.lexsort((candidates[selected], -scores[selected]))]
+        return list(zip(candidates[order].tolist(), scores[order].tolist()))
+
+    def rank(self, docs, query_terms):
+        """[(doc, score)] de todos os candidatos, do maior score para o menor"""
+        return self.top_k(docs, query_terms, len(docs))
+
+
+class MatrixScorerCache:
+    """MatrixScorer da versão atual de um índice, remontado fora do caminho das consultas"""
+
+    def __init__(self, index):
+        self.index = index
+        self._scorer = None
+        self._builder = None  # thread da montagem em andamento
+        self._lock = threading.Lock()
+
+    def get(self):
+        """MatrixScorer da versão atual, ou None enquanto ele é (re)montado"""
+        scorer = self._current()
+        if scorer is None:
+            with self._lock:
+                if self._builder is None:
+                    self._builder = threading.Thread(target=self._build, daemon=True)
+                    self._builder.start()
+        return scorer
+
+    def build(self):
+        """Monta a matriz da versão atual nesta thread, depois da montagem em andamento"""
+        with self._lock:
+            builder = self._builder
+        if builder is not None:
+            builder.join()
+        if self._current() is None:
+            self._build()
+        return self._current()
+
+    def _current(self):
+        scorer = self._scorer
+        if scorer is not None and scorer.version == getattr(self.index, 'version', 0):
+            return scorer
+        return None
+
+    def _build(self):
+        try:
+            # Uma escrita durante a montagem deixa a matriz com a versão
+            # anterior: ela nunca é usada e a próxima consulta pede outra
+            self._scorer = MatrixScorer(self.index)
+        except RuntimeError:
+            pass  # o índice mudou durante a travessia do vocabulário
+        finally:
+            with self._lock:
+                if self._builder is threading.current_thread():
+                    self._builder = None
+
+
+def _candidate_array(docs):
+    # Listas de postings já estão ordenadas; conjuntos e bitmaps são ordenados aqui
+    if isinstance(docs, PostingList):
+        return np.asarray(docs.ids, dtype=np.int64)
+    return np.sort(np.fromiter(docs, dtype=np.int64, count=len(docs)))
@@ -0,0 +1,101 @@
+"""
+Módulo de Cache de Consultas
+Guarda os resultados ranqueados das consultas mais recentes.
+
+As entradas são indexadas pela forma normalizada da consulta (ver
+QueryProcessor.normalize_query) e removidas em ordem LRU quando o total
+estimado de memória passa do limite. Cada índice expõe um atributo version,
+incrementado a cada alteração; quando a versão muda, o cache inteiro é
+descartado.
+"""
+
+import sys
+import threading
+from collections import OrderedDict
+
+
+class QueryCache:
+    def __init__(self, max_bytes=16 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # {chave: (total, resultados, tamanho estimado)}
+        self.bytes = 0
+        self.version = None  # versão do índice a que as entradas se referem
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+        self._lock = threading.Lock()
+
+    def get(self, key, version, min_results):
+        """Retorna (total, resultados) se a entrada cobrir min_results, senão None"""
+        with self._lock:
+            self._check_version(version)
+
+            entry = self.entries.get(key)
+            # A entrada serve se tem resultados suficientes ou já é a lista completa
+            if entry is None or (len(entry[1]) < min_results and len(entry[1]) < entry[0]):
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0], entry[1]
+
+    def put(self, key, version, total, results):
+        size = _estimate_size(key, results)
+
+        with self._lock:
+            self._check_version(version)
+            if size > self.max_bytes:
+                return
+
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[2]
+
+            self.entries[key] = (total, results, size)
+            self.bytes += size
+
+            # Remove as entradas usadas há mais tempo até caber no limite
+            while self.bytes > self.max_bytes:
+                _, (_, _, evicted_size) = self.entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def _check_version(self, version):
+        if version != self.version:
+            if self.entries:
+                self.invalidations += 1
+            self.entries.clear()
+            self.bytes = 0
+            self.version = version
+
+    def get_statistics(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
+
+
+def _estimate_size(key, results):
+    # Lista, tuplas (doc_id, score) e os objetos referenciados; 64 bytes
+    # cobrem a tupla de dois elementos e o ponteiro na lista
+    size = sys.getsizeof(key) + sys.getsizeof(results)
+    for doc_id, score in results:
+        size += 64 + sys.getsizeof(doc_id) + sys.getsizeof(score)
+    return size
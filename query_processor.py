@@ -4,33 +4,531 @@ Processa consultas booleanas e retorna resultados ordenados por relevância.
 """
 
 import re
-import math
+import time
+import heapq
+from array import array
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
 from inverted_index import InvertedIndex
+from matrix_scorer import HAS_NUMPY, MatrixScorerCache
+from postings import PostingList, RoaringBitmap, union_all
+
+
+# Profundidade do ranking guardado no cache: as primeiras páginas de uma
+# consulta são servidas pela mesma entrada
+CACHE_DEPTH = 100
+
+# Folga nas comparações com o limiar do top-k, cobrindo o arredondamento
+# entre a soma dos limites e o score calculado
+PRUNE_EPSILON = 1e-9
+
+# Largura, em ids de documento, das janelas em que o MaxScore percorre as
+# listas essenciais antes de pontuar os candidatos
+MAX_SCORE_WINDOW = 512
+
+# Máximo de termos em que um prefixo (econom*) ou termo aproximado (econmy~1)
+# é expandido; prefixos mantêm os primeiros em ordem alfabética, termos
+# aproximados os de menor distância
+MAX_EXPANSIONS = 64
+
+# Maior número de edições aceito em term~N; term~ usa este valor
+MAX_EDITS = 2
+
+# Menor número de candidatos pontuado com o MatrixScorer (NumPy); abaixo
+# disso o custo fixo das operações em arrays supera o da pontuação em Python
+VECTOR_MIN_CANDIDATES = 32
+
+
+class PlanNode:
+    """Nó do plano de execução de uma consulta booleana.
+
+    op é 'TERM', 'EXPAND', 'PHRASE', 'AND' ou 'OR'; um EXPAND guarda o
+    padrão (econom* ou econmy~1) e tem como filhos os termos em que ele foi
+    expandido; um PHRASE guarda as palavras da frase e tem como filhos seus
+    termos distintos. key identifica a subexpressão de forma
+    canônica (operandos ordenados), de modo que subexpressões repetidas são
+    avaliadas uma única vez; cost estima o número de documentos do resultado;
+    truncated indica um EXPAND com mais termos que o limite de expansões.
+    """
+
+    __slots__ = ('op', 'term', 'children', 'key', 'cost', 'truncated')
+
+    def __init__(self, op, term=None, children=None, key=None, cost=0, truncated=False):
+        self.op = op
+        self.term = term
+        self.children = children or []
+        self.key = key if key is not None else term
+        self.cost = cost
+        self.truncated = truncated
+
+
+class BatchIndexView:
+    """Visão do índice compartilhada pelas consultas de um lote.
+
+    Postings, estatísticas e expansões de padrões são buscadas no índice uma
+    única vez por termo e guardadas em dicionários lidos por todas as
+    consultas (e threads) do lote; os demais atributos são os do índice.
+    """
+
+    def __init__(self, index):
+        self.index = index
+        self.version = getattr(index, 'version', 0)
+        self._postings = {}
+        self._statistics = {}
+        self._expansions = {}
+
+    def __getattr__(self, name):
+        return getattr(self.index, name)
+
+    def prefetch(self, terms):
+        for term in terms:
+            self.search_term(term)
+            self.get_term_statistics(term)
+
+    # setdefault mantém a primeira lista guardada se duas threads buscarem o
+    # mesmo termo ao mesmo tempo
+
+    def search_term(self, term):
+        postings = self._postings.get(term)
+        if postings is None:
+            postings = self._postings.setdefault(term, self.index.search_term(term))
+        return postings
+
+    def get_term_statistics(self, term):
+        statistics = self._statistics.get(term)
+        if statistics is None:
+            statistics = self._statistics.setdefault(term, self.index.get_term_statistics(term))
+        return statistics
+
+    def expand_prefix(self, prefix, limit=None):
+        key = ('*', prefix, limit)
+        terms = self._expansions.get(key)
+        if terms is None:
+            terms = self._expansions.setdefault(key, self.index.expand_prefix(prefix, limit))
+        return terms
+
+    def expand_fuzzy(self, term, max_edits, limit=None):
+        key = ('~', term, max_edits, limit)
+        terms = self._expansions.get(key)
+        if terms is None:
+            terms = self._expansions.setdefault(key, self.index.expand_fuzzy(term, max_edits, limit))
+        return terms
 
 
 class QueryProcessor:
-    def __init__(self, inverted_index):
+    """Avalia consultas sobre um índice.
+
+    O caminho de leitura não usa locks próprios e pode ser chamado por várias
+    threads ao mesmo tempo: cada consulta guarda seu estado em variáveis
+    locais, os caches compartilhados (QueryCache, PostingCache, o LRU do
+    DocumentStore) têm seus próprios locks, e a matriz do MatrixScorer é
+    montada por uma única thread em segundo plano (MatrixScorerCache) e só
+    substitui a anterior quando está pronta. Alterações no InvertedIndex não
+    podem ocorrer durante as leituras; para servir e indexar ao mesmo tempo
+    use SegmentedIndex ou MappedIndex.
+    """
+
+    def __init__(self, inverted_index, cache=None, max_expansions=MAX_EXPANSIONS, vectorized=True,
+                 pool=None):
         self.index = inverted_index
+        self.cache = cache  # QueryCache opcional para process_query_top_k
+        self.max_expansions = max_expansions  # limite de termos por padrão
+        
+        # ScoringPool opcional: process_query_top_k avalia as consultas em
+        # outros processos, que abrem o mesmo arquivo de índice
+        self.pool = pool
+        
+        # Pontuação com NumPy, se disponível e se o índice expõe a matriz de
+        # frequências (iter_postings); a matriz é montada em segundo plano
+        self.vectorized = vectorized and HAS_NUMPY and hasattr(inverted_index, 'iter_postings')
+        self._scorers = MatrixScorerCache(inverted_index) if self.vectorized else None
+    
+    def warm_up(self):
+        """Monta a matriz da pontuação vetorizada antes da primeira consulta"""
+        if self._scorers is not None:
+            self._scorers.build()
     
     def process_query(self, query_string):
         # Parse da consulta
-        doc_ids = self._evaluate_query(query_string)
+        docs = self._evaluate_query(query_string)
         
-        if not doc_ids:
+        if not docs:
             return []
         
         # Calcula relevância para cada documento
         query_terms = self._extract_terms(query_string)
-        scored_docs = []
+        scorer = self._matrix_scorer(docs)
+        if scorer is not None:
+            scored_docs = scorer.rank(docs, sorted(query_terms))
+        else:
+            scored_docs = list(self._score_documents(docs, query_terms))
+            
+            # Ordena por decrescente
+            scored_docs.sort(key=lambda x: x[1], reverse=True)
         
-        for doc_id in doc_ids:
-            score = self._calculate_relevance(doc_id, query_terms)
-            scored_docs.append((doc_id, score))
+        return [(self.index.get_doc_id(doc), score) for doc, score in scored_docs]
+    
+    def iter_results(self, query_string):
+        """Gera (doc_id, score) de todo o resultado, do mais relevante para o menos relevante.
+
+        Os scores dos candidatos são calculados de uma vez, mas a ordenação é
+        feita sob demanda com um heap: quem consome só as primeiras linhas
+        não paga a ordenação do resultado inteiro. Empates ficam com o menor id.
+        """
+        docs = self._evaluate_query(query_string)
+        if not docs:
+            return
+        
+        query_terms = self._extract_terms(query_string)
+        scorer = self._matrix_scorer(docs)
+        if scorer is not None:
+            for doc, score in scorer.rank(docs, sorted(query_terms)):
+                yield self.index.get_doc_id(doc), score
+            return
+        
+        heap = [(-score, doc) for doc, score in self._score_documents(docs, query_terms)]
+        heapq.heapify(heap)
+        while heap:
+            negative_score, doc = heapq.heappop(heap)
+            yield self.index.get_doc_id(doc), -negative_score
+    
+    def process_query_top_k(self, query_string, k):
+        """Retorna (total de resultados, k documentos mais relevantes).
+
+        Mantém apenas os k maiores scores em um heap limitado, na mesma ordem
+        que process_query produziria, sem ordenar a lista completa. Consultas
+        curtas só com OR usam MaxScore para pular documentos que não entram no
+        top-k; consultas largas somam os scores percorrendo cada lista uma vez.
+        Com um ScoringPool, a avaliação é feita em um processo do pool e o
+        cache continua neste processo.
+        """
+        evaluate = self.pool.top_k if self.pool is not None else self._top_k
+        
+        if self.cache is None or k <= 0:
+            return evaluate(query_string, k)
+        
+        # Entradas do cache valem apenas para a versão atual do índice
+        key = self.normalize_query(query_string)
+        version = getattr(self.index, 'version', 0)
+        
+        cached = self.cache.get(key, version, k)
+        if cached is not None:
+            total, results = cached
+            return total, results[:k]
+        
+        total, results = evaluate(query_string, max(k, CACHE_DEPTH))
+        self.cache.put(key, version, total, results)
+        return total, results[:k]
+    
+    def process_batch(self, queries, k=10, workers=1):
+        """Avalia uma lista de consultas, com os resultados na ordem de entrada.
+
+        Consultas equivalentes (mesma normalize_query) são avaliadas uma
+        única vez, e os termos de todo o lote são buscados no índice antes da
+        avaliação, cada um uma única vez (ver BatchIndexView). Com
+        workers > 1, as consultas distintas são distribuídas entre threads que
+        compartilham essas listas. Cada resultado é um dicionário com query,
+        total_results, results (os k melhores (doc_id, score)) e time_ms, o
+        tempo da avaliação da consulta.
+        """
+        view = BatchIndexView(self.index)
+        batch = QueryProcessor(view, self.cache, self.max_expansions, self.vectorized)
+        batch._scorers = self._scorers  # matriz do próprio índice, não da visão
+        
+        keys = [batch.normalize_query(query) for query in queries]
+        distinct = {}  # {chave: primeira consulta com a chave}
+        for key, query in zip(keys, queries):
+            distinct.setdefault(key, query)
+        
+        terms = set()
+        for query in distinct.values():
+            terms.update(batch._extract_terms(query))
+        view.prefetch(terms)
+        
+        def evaluate(query):
+            start = time.perf_counter()
+            total, results = batch.process_query_top_k(query, k)
+            return total, results, (time.perf_counter() - start) * 1000
+        
+        if workers > 1 and len(distinct) > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                evaluated = list(executor.map(evaluate, distinct.values()))
+        else:
+            evaluated = [evaluate(query) for query in distinct.values()]
+        
+        by_key = dict(zip(distinct, evaluated))
+        return [{'query': query, 'total_results': by_key[key][0], 'results': by_key[key][1],
+                 'time_ms': by_key[key][2]}
+                for query, key in zip(queries, keys)]
+    
+    def normalize_query(self, query_string):
+        """Forma canônica da consulta, usada como chave do cache.
+
+        Combina a chave do plano (cadeias achatadas, operandos ordenados e
+        sem repetição) com os termos pontuados em ordem alfabética, de modo
+        que consultas equivalentes como "b OR a" e "a OR b" coincidem.
+        """
+        tokens = self._tokenize_query(query_string)
+        plan = self._plan_rpn(self._to_rpn(tokens), estimate=False) if tokens else None
+        terms = ' '.join(sorted(self._extract_terms(query_string, expand=False)))
+        return f"{plan.key if plan is not None else ''}|{terms}"
+    
+    def _top_k(self, query_string, k):
+        tokens = self._tokenize_query(query_string)
+        plan = self._plan_rpn(self._to_rpn(tokens)) if tokens else None
+        docs = self._execute_plan(plan, {}) if plan is not None else set()
+        
+        if not docs or k <= 0:
+            return len(docs), []
+        
+        query_terms = sorted(self._extract_terms(query_string))
+        
+        scorer = self._matrix_scorer(docs)
+        if scorer is not None:
+            # Todos os candidatos pontuados de uma vez, com NumPy
+            top_docs = scorer.top_k(docs, query_terms, k)
+            return len(docs), [(self.index.get_doc_id(doc), score) for doc, score in top_docs]
+        
+        term_data = self._term_data(query_terms)
+        
+        sequential = all(isinstance(postings, PostingList) for postings, _, _ in term_data)
+        if sequential and self._is_disjunction(plan, query_terms):
+            top_docs = self._max_score_top_k(query_terms, term_data, k)
+        elif sequential and sum(len(postings) for postings, _, _ in term_data) <= \
+                len(docs) * len(term_data):
+            # Percorrer as listas inteiras custa menos que uma busca binária
+            # por documento e termo (sempre o caso em disjunções)
+            top_docs = self._accumulate_top_k(docs, term_data, k)
+        else:
+            scored_docs = self._score_documents(docs, query_terms, term_data)
+            top_docs = heapq.nlargest(k, scored_docs, key=lambda x: x[1])
+        
+        return len(docs), [(self.index.get_doc_id(doc), score) for doc, score in top_docs]
+    
+    def _matrix_scorer(self, docs):
+        """MatrixScorer da versão atual do índice, ou None se docs deve ser pontuado em Python"""
+        if not self.vectorized or len(docs) < VECTOR_MIN_CANDIDATES:
+            return None
+        
+        # Matriz desatualizada (índice alterado) é remontada em segundo plano;
+        # enquanto isso, a pontuação em Python dá os mesmos scores
+        return self._scorers.get()
+    
+    def _term_data(self, query_terms):
+        # Postings e estatísticas de cada termo da consulta, buscadas uma única
+        # vez; a ordem alfabética torna o score independente da ordem na consulta
+        term_data = []
+        for term in sorted(query_terms):
+            mean_freq, std_dev, _ = self.index.get_term_statistics(term)
+            term_data.append((self.index.search_term(term), mean_freq, std_dev))
+        return term_data
+    
+    def _score_documents(self, docs, query_terms, term_data=None):
+        """Gera (doc, relevância) para cada documento do resultado.
+
+        Lê as frequências direto das listas: a relevância é a média dos
+        z-scores de _calculate_z_score de cada termo da consulta.
+        """
+        if term_data is None:
+            term_data = self._term_data(query_terms)
+        
+        for doc in docs:
+            yield doc, self._document_score(doc, term_data)
+    
+    def _document_score(self, doc, term_data):
+        z_sum = 0.0
+        for postings, mean_freq, std_dev in term_data:
+            term_freq_doc = postings.frequency(doc)
+            if term_freq_doc and std_dev:
+                z_sum += (term_freq_doc - mean_freq) / std_dev
         
-        # Ordena por decrescente
-        scored_docs.sort(key=lambda x: x[1], reverse=True)
+        # Média dos z-scores
+        return z_sum / len(term_data) if term_data else 0.0
+    
+    def _ranked_score(self, ranked, stats, size):
+        # Mesmo score de _document_score a partir das ocorrências
+        # (posição em term_data, frequência) do documento, somadas na mesma
+        # ordem; stats traz (média, desvio padrão, repetições) de cada termo
+        z_sum = 0.0
+        for rank, term_freq_doc in ranked:
+            mean_freq, std_dev, weight = stats[rank]
+            if std_dev:
+                for _ in range(weight):
+                    z_sum += (term_freq_doc - mean_freq) / std_dev
+        return z_sum / size
+    
+    def _is_disjunction(self, plan, query_terms):
+        # O resultado é exatamente a união das listas dos termos pontuados
+        leaves = set()
+        for node in (plan.children if plan.op == 'OR' else [plan]):
+            if node.op == 'TERM':
+                leaves.add(node.term)
+            elif node.op == 'EXPAND':
+                leaves.update(child.term for child in node.children)
+            else:
+                return False
+        return leaves == set(query_terms)
+    
+    def _accumulate_top_k(self, docs, term_data, k):
+        """Top-k de docs somando os z-scores lista a lista.
+
+        Percorre cada lista uma vez, acumulando em um dicionário; a soma de
+        cada documento segue a ordem de term_data, então os scores são
+        idênticos aos de _document_score.
+        """
+        z_sums = {}
+        get = z_sums.get
+        for postings, mean_freq, std_dev in term_data:
+            if not std_dev:
+                continue
+            for doc, term_freq_doc in zip(postings.ids, postings.tfs):
+                z_sums[doc] = get(doc, 0.0) + (term_freq_doc - mean_freq) / std_dev
+        
+        size = len(term_data)
+        scored_docs = ((doc, get(doc, 0.0) / size) for doc in docs)
+        return heapq.nlargest(k, scored_docs, key=lambda x: x[1])
+    
+    def _max_score_top_k(self, query_terms, term_data, k):
+        """Top-k de uma disjunção com MaxScore, igual ao de _score_documents.
+
+        Cada termo tem um limite superior de contribuição, o z-score da
+        maior frequência da lista. Os termos ficam em ordem crescente de
+        limite; os primeiros, cuja soma de limites não supera o menor score
+        do heap, deixam de ser essenciais: um documento que só aparece neles
+        não entra no top-k, então os candidatos vêm apenas das listas
+        essenciais e os demais termos só são consultados enquanto o
+        documento ainda puder superar o limiar. As listas essenciais são
+        percorridas uma de cada vez em janelas de MAX_SCORE_WINDOW ids, como
+        no acúmulo por lista, de modo que o custo por candidato não cresce
+        com o número de termos da disjunção; o limiar e os termos essenciais
+        são atualizados a cada janela.
+        """
+        size = len(term_data)
+        
+        # Agrupa ocorrências repetidas do mesmo termo
+        weights = {}
+        for term, (postings, mean_freq, std_dev) in zip(query_terms, term_data):
+            if term in weights:
+                weights[term][3] += 1
+            else:
+                weights[term] = [postings, mean_freq, std_dev, 1]
+        
+        # Cada termo contribui tf * scale - offset ao score; estas somas só
+        # decidem a poda. Termos com desvio padrão zero (presentes com a mesma
+        # frequência em todos os documentos) não somam ao score, mas seus
+        # documentos ainda são candidatos: entram com limite 0. rank é a
+        # posição do termo em term_data
+        terms = []
+        for rank, (postings, mean_freq, std_dev, weight) in enumerate(weights.values()):
+            if postings:
+                scale = weight / (std_dev * size) if std_dev else 0.0
+                offset = mean_freq * scale
+                bound = max(postings.tfs) * scale - offset
+                terms.append((bound, postings.ids, postings.tfs, scale, offset, rank))
+        terms.sort(key=lambda entry: entry[0])
+        bounds, id_lists, tf_lists, scales, offsets, ranks = zip(*terms) if terms else ((),) * 6
+        stats = [(mean_freq, std_dev, weight) for _, mean_freq, std_dev, weight in weights.values()]
+        
+        # prefix[i]: soma dos limites dos termos 0..i
+        prefix = []
+        total = 0.0
+        for bound in bounds:
+            total += bound
+            prefix.append(total)
+        
+        positions = [0] * len(terms)
+        heap = []
+        threshold = -float('inf')
+        first = 0  # Primeiro termo essencial
+        
+        while True:
+            # Próxima janela: começa no menor id atual das listas essenciais
+            low = None
+            for i in range(first, len(terms)):
+                ids = id_lists[i]
+                if positions[i] < len(ids) and (low is None or ids[positions[i]] < low):
+                    low = ids[positions[i]]
+            if low is None:
+                break
+            high = low + MAX_SCORE_WINDOW
+            
+            # Ocorrências (termo, frequência) das listas essenciais em cada
+            # documento da janela, uma lista por vez
+            hits = {}
+            for i in range(first, len(terms)):
+                ids = id_lists[i]
+                position = positions[i]
+                end = bisect_left(ids, high, position)
+                for doc, term_freq_doc in zip(ids[position:end], tf_lists[i][position:end]):
+                    if doc in hits:
+                        hits[doc].append((i, term_freq_doc))
+                    else:
+                        hits[doc] = [(i, term_freq_doc)]
+                positions[i] = end
+            
+            # O limiar pode subir dentro da janela, mas os termos essenciais
+            # só mudam na próxima: estes já estão em hits
+            essential = first
+            ends = [bisect_left(id_lists[i], high, positions[i]) for i in range(essential)]
+            
+            # Se há mais buscas binárias possíveis que ocorrências dos termos
+            # não essenciais na janela, percorrer essas listas custa menos
+            if len(hits) * essential > sum(ends) - sum(positions[:essential]):
+                for i in range(essential):
+                    position = positions[i]
+                    for doc, term_freq_doc in zip(id_lists[i][position:ends[i]],
+                                                  tf_lists[i][position:ends[i]]):
+                        if doc in hits:
+                            hits[doc].append((i, term_freq_doc))
+                    positions[i] = ends[i]
+                essential = 0
+            
+            for doc in sorted(hits):
+                doc_hits = hits[doc]
+                z_sum = 0.0
+                for i, term_freq_doc in doc_hits:
+                    z_sum += term_freq_doc * scales[i] - offsets[i]
+                
+                # Termos não essenciais, do maior limite para o menor,
+                # enquanto o documento ainda puder entrar no top-k
+                pruned = False
+                for i in range(essential - 1, -1, -1):
+                    if z_sum + prefix[i] <= threshold - PRUNE_EPSILON:
+                        pruned = True
+                        break
+                    position = positions[i]
+                    if position == ends[i]:
+                        continue
+                    ids = id_lists[i]
+                    position = bisect_left(ids, doc, position, ends[i])
+                    positions[i] = position
+                    if position < ends[i] and ids[position] == doc:
+                        term_freq_doc = tf_lists[i][position]
+                        z_sum += term_freq_doc * scales[i] - offsets[i]
+                        doc_hits.append((i, term_freq_doc))
+                
+                if pruned or (len(heap) == k and z_sum <= threshold - PRUNE_EPSILON):
+                    continue
+                
+                # Empates ficam com o menor id, como na ordem estável de
+                # heapq.nlargest
+                ranked = sorted((ranks[i], term_freq_doc) for i, term_freq_doc in doc_hits)
+                entry = (self._ranked_score(ranked, stats, size), -doc)
+                if len(heap) < k:
+                    heapq.heappush(heap, entry)
+                elif entry > heap[0]:
+                    heapq.heapreplace(heap, entry)
+                else:
+                    continue
+                
+                if len(heap) == k:
+                    threshold = heap[0][0]
+            
+            while first < len(terms) and prefix[first] <= threshold - PRUNE_EPSILON:
+                first += 1
         
-        return scored_docs
+        heap.sort(reverse=True)
+        return [(-negative_doc, score) for score, negative_doc in heap]
     
     def _evaluate_query(self, query_string):
         tokens = self._tokenize_query(query_string)
@@ -39,7 +537,7 @@ class QueryProcessor:
         return self._evaluate_tokens(tokens)
     
     def _tokenize_query(self, query_string):
-        pattern = r'\(|\)|AND|OR|[a-zA-Z0-9]+' # AND e OR
+        pattern = r'"[^"]*"|\(|\)|AND|OR|[a-zA-Z0-9]+(?:\*|~[0-9]?)?' # Frases, AND, OR, prefixos (econom*) e termos aproximados (econmy~1)
         tokens = re.findall(pattern, query_string)
         return tokens
     
@@ -50,8 +548,241 @@ class QueryProcessor:
         # Converte a notação 
         rpn = self._to_rpn(tokens)
         
-        # Avalia a RPN
-        return self._evaluate_rpn(rpn)
+        # Monta o plano a partir da RPN e o executa
+        plan = self._plan_rpn(rpn)
+        if plan is None:
+            return set()
+        return self._execute_plan(plan, {})
+    
+    def explain(self, query_string):
+        """Plano de execução da consulta em formato serializável (JSON)"""
+        tokens = self._tokenize_query(query_string)
+        plan = self._plan_rpn(self._to_rpn(tokens)) if tokens else None
+        if plan is None:
+            return None
+        return self._describe_plan(plan, set())
+    
+    def _describe_plan(self, node, seen):
+        if node.op == 'TERM':
+            description = {'term': node.term, 'df': node.cost}
+        elif node.op == 'EXPAND':
+            # Os termos da expansão são listados sem um nó por termo
+            kind = 'prefix' if node.term.endswith('*') else 'fuzzy'
+            return {kind: node.term, 'estimate': node.cost,
+                    'terms': [child.term for child in node.children],
+                    'truncated': node.truncated}
+        else:
+            description = {'op': node.op, 'estimate': node.cost}
+            if node.op == 'PHRASE':
+                description['phrase'] = node.term
+        
+        if node.key in seen:
+            # Subexpressão repetida: reaproveita o resultado já calculado
+            description['reused'] = True
+        else:
+            seen.add(node.key)
+            if node.children:
+                description['children'] = [self._describe_plan(child, seen) for child in node.children]
+        
+        return description
+    
+    def _plan_rpn(self, rpn, estimate=True):
+        """Converte a RPN em uma árvore de PlanNode.
+
+        Com estimate=False as frequências não são consultadas (só a chave
+        canônica do plano interessa).
+        """
+        stack = []
+        
+        for token in rpn:
+            if token in ('AND', 'OR'):
+                # Operador com um único operando mantém o operando
+                if len(stack) >= 2:
+                    right = stack.pop()
+                    left = stack.pop()
+                    stack.append(self._combine(token, left, right))
+            elif token.startswith('"'):
+                node = self._plan_phrase(token, estimate)
+                if node is not None:
+                    stack.append(node)
+            elif self._is_pattern(token):
+                stack.append(self._plan_expansion(token.lower(), estimate))
+            else:
+                term = token.lower()
+                doc_freq = self.index.get_term_statistics(term)[2] if estimate else 0
+                stack.append(PlanNode('TERM', term=term, cost=doc_freq))
+        
+        if stack:
+            return stack[0]
+        return None
+    
+    def _plan_expansion(self, pattern, estimate=True):
+        # Um filho por termo da expansão; o custo é o limite superior da união
+        if not estimate:
+            return PlanNode('EXPAND', term=pattern)
+        
+        # Um termo além do limite só para saber se a expansão foi cortada
+        terms = self._expand_pattern(pattern, self.max_expansions + 1)
+        truncated = len(terms) > self.max_expansions
+        
+        children = []
+        for term in terms[:self.max_expansions]:
+            doc_freq = self.index.get_term_statistics(term)[2]
+            children.append(PlanNode('TERM', term=term, cost=doc_freq))
+        return PlanNode('EXPAND', term=pattern, children=children,
+                        cost=sum(child.cost for child in children), truncated=truncated)
+    
+    def _plan_phrase(self, token, estimate=True):
+        # Frases de uma palavra são um termo comum; frases vazias são ignoradas
+        words = InvertedIndex._tokenize(token)
+        if not words:
+            return None
+        
+        children = []
+        for term in dict.fromkeys(words):
+            doc_freq = self.index.get_term_statistics(term)[2] if estimate else 0
+            children.append(PlanNode('TERM', term=term, cost=doc_freq))
+        if len(words) == 1:
+            return children[0]
+        
+        # A frase não tem mais documentos que o seu termo mais raro
+        phrase = ' '.join(words)
+        return PlanNode('PHRASE', term=phrase, children=children, key=f'"{phrase}"',
+                        cost=min(child.cost for child in children))
+    
+    @staticmethod
+    def _is_pattern(token):
+        return token.endswith('*') or '~' in token
+    
+    def _expand_pattern(self, pattern, limit=None):
+        """Termos do índice que casam com o padrão: prefixo* ou termo~N.
+
+        Retorna no máximo limit termos (max_expansions, por padrão).
+        """
+        if limit is None:
+            limit = self.max_expansions
+        if pattern.endswith('*'):
+            return self.index.expand_prefix(pattern[:-1], limit)
+        
+        term, _, edits = pattern.partition('~')
+        max_edits = min(int(edits), MAX_EDITS) if edits else MAX_EDITS
+        return self.index.expand_fuzzy(term, max_edits, limit)
+    
+    def _combine(self, op, left, right):
+        # Achata cadeias do mesmo operador: (a AND b) AND c vira AND(a, b, c)
+        children = []
+        seen = set()
+        for node in (left, right):
+            for child in (node.children if node.op == op else [node]):
+                # a AND a = a, a OR a = a
+                if child.key not in seen:
+                    seen.add(child.key)
+                    children.append(child)
+        
+        if len(children) == 1:
+            return children[0]
+        
+        # Operandos mais seletivos primeiro
+        children.sort(key=lambda child: (child.cost, child.key))
+        
+        if op == 'AND':
+            cost = children[0].cost
+        else:
+            cost = sum(child.cost for child in children)
+        
+        key = f"{op}({','.join(sorted(child.key for child in children))})"
+        return PlanNode(op, children=children, key=key, cost=cost)
+    
+    def _execute_plan(self, node, cache):
+        """Executa o plano; cache guarda o resultado de cada subexpressão já avaliada"""
+        if node.key in cache:
+            return cache[node.key]
+        
+        if node.op == 'TERM':
+            result = self.index.search_term(node.term)
+        elif node.op == 'EXPAND':
+            result = self._execute_expansion(node, cache)
+        elif node.op == 'PHRASE':
+            result = self._execute_phrase(node, cache)
+        elif node.op == 'AND':
+            result = self._execute_and(node, cache)
+        else:
+            result = None
+            for child in node.children:
+                docs = self._execute_plan(child, cache)
+                result = docs if result is None else result | docs
+        
+        cache[node.key] = result
+        return result
+    
+    def _execute_expansion(self, node, cache):
+        if not node.children:
+            # Nenhum termo casou: o próprio padrão não está no índice,
+            # e a busca devolve a lista vazia no tipo usado pelo índice
+            return self.index.search_term(node.term)
+        
+        lists = [self._execute_plan(child, cache) for child in node.children]
+        if all(isinstance(docs, PostingList) for docs in lists):
+            # União de todas as listas de uma vez, sem uniões parciais
+            return PostingList(union_all([docs.ids for docs in lists]), array('I'))
+        
+        result = set()
+        for docs in lists:
+            result.update(docs)
+        return result
+    
+    def _execute_phrase(self, node, cache):
+        """Documentos com as palavras da frase em posições consecutivas.
+
+        Os candidatos são a interseção das listas dos termos (do mais raro
+        para o mais frequente); em cada candidato, as posições do primeiro
+        termo são cruzadas com as dos seguintes deslocadas de 1, 2, ...
+        """
+        candidates = None
+        for child in sorted(node.children, key=lambda child: child.cost):
+            docs = self._execute_plan(child, cache)
+            candidates = docs if candidates is None else candidates & docs
+            if not candidates:
+                return candidates
+        
+        words = node.term.split()
+        matches = [doc for doc in candidates if self._contains_phrase(doc, words)]
+        if isinstance(candidates, (PostingList, RoaringBitmap)):
+            return PostingList(array('I', matches), array('I'))
+        return set(matches)
+    
+    def _contains_phrase(self, doc, words):
+        positions = self.index.get_term_positions(self.index.get_doc_id(doc), set(words))
+        if len(positions) < len(set(words)):
+            return False
+        
+        following = [set(positions[word][0]) for word in words[1:]]
+        for start in positions[words[0]][0]:
+            if all(start + i in following[i - 1] for i in range(1, len(words))):
+                return True
+        return False
+    
+    def _execute_and(self, node, cache):
+        result = None
+        
+        for child in node.children:
+            if result is None:
+                result = self._execute_plan(child, cache)
+            elif not result:
+                # Interseção vazia: os operandos restantes nem são avaliados
+                break
+            elif child.op == 'OR' and len(result) < child.cost:
+                # Resultado parcial pequeno: intersecta com cada operando do OR
+                # em vez de materializar a união inteira
+                union = None
+                for grandchild in child.children:
+                    docs = result & self._execute_plan(grandchild, cache)
+                    union = docs if union is None else union | docs
+                result = union
+            else:
+                result = result & self._execute_plan(child, cache)
+        
+        return result
     
     def _to_rpn(self, tokens):
         output = []
@@ -90,57 +821,22 @@ class QueryProcessor:
         
         return output
     
-    def _evaluate_rpn(self, rpn):
-        stack = []
-        
-        for token in rpn:
-            if token == 'AND':
-                # Operação AND (interseção)
-                if len(stack) >= 2:
-                    right = stack.pop()
-                    left = stack.pop()
-                    stack.append(left & right)
-                elif len(stack) == 1:
-                    # Se só há um operando, mantém ele
-                    pass
-            
-            elif token == 'OR':
-                # Operação OR (união)
-                if len(stack) >= 2:
-                    right = stack.pop()
-                    left = stack.pop()
-                    stack.append(left | right)
-                elif len(stack) == 1:
-                    # Se só há um operando, mantém ele
-                    pass
-            
-            else:
-                # É um termo, busca no índice
-                docs = self.index.search_term(token.lower())
-                stack.append(docs)
-        
-        # Retorna o resultado final
-        if stack:
-            return stack[0]
-        return set()
-    
-    def _extract_terms(self, query_string):
+    def _extract_terms(self, query_string, expand=True):
         tokens = self._tokenize_query(query_string)
-        terms = [t.lower() for t in tokens if t not in ['AND', 'OR', '(', ')']]
+        terms = []
+        for t in tokens:
+            if t in ['AND', 'OR', '(', ')']:
+                continue
+            if t.startswith('"'):
+                # Cada palavra da frase é pontuada como um termo
+                terms.extend(InvertedIndex._tokenize(t))
+            elif self._is_pattern(t) and expand:
+                # Prefixos e termos aproximados contribuem com cada termo da expansão
+                terms.extend(self._expand_pattern(t.lower()))
+            else:
+                terms.append(t.lower())
         return terms
     
-    def _calculate_relevance(self, doc_id, query_terms):
-        z_scores = []
-        
-        for term in query_terms:
-            z_score = self._calculate_z_score(doc_id, term)
-            z_scores.append(z_score)
-        
-        # Média dos z-scores
-        if z_scores:
-            return sum(z_scores) / len(z_scores)
-        return 0.0
-    
     def _calculate_z_score(self, doc_id, term):
 
         # Frequência do termo no documento
@@ -149,23 +845,8 @@ class QueryProcessor:
         if term_freq_doc == 0:
             return 0.0
         
-        # Frequência total do termo no corpus
-        total_term_freq = self.index.corpus_term_freq.get(term.lower(), 0)
-        
-        if total_term_freq == 0:
-            return 0.0
-        
-        # Média de frequência do termo no corpus
-        mean_freq = total_term_freq / self.index.total_docs
-        
-        # Calcula desvio padrão
-        variance = 0
-        for doc in self.index.documents.keys():
-            freq = self.index.get_term_frequency(doc, term)
-            variance += (freq - mean_freq) ** 2
-        
-        variance /= self.index.total_docs
-        std_dev = math.sqrt(variance)
+        # Média e desvio padrão pré-calculados pelo índice
+        mean_freq, std_dev, _ = self.index.get_term_statistics(term)
         
         # Z score
         if std_dev == 0:
@@ -175,12 +856,11 @@ class QueryProcessor:
         return z_score
     
     def generate_snippet(self, doc_id, query_terms, context_size=80):
-        doc = self.index.get_document(doc_id)
-        if not doc:
+        # Só o conteúdo é lido do armazenamento de documentos
+        content = self.index.get_content(doc_id)
+        if content is None:
             return ""
         
-        content = doc['content']
-        
         # Encontra o termo mais relevante no documento
         best_term = None
         best_score = -float('inf')
@@ -195,19 +875,23 @@ class QueryProcessor:
             # Se não houver termo relevante, retorna início do documento
             return content[:context_size * 2] + "..."
         
-        content_lower = content.lower()
-        term_pos = content_lower.find(best_term.lower())
+        # Offset da primeira ocorrência do termo como palavra inteira, vindo
+        # do índice posicional, sem varrer o conteúdo
+        occurrences = self.index.get_term_positions(doc_id, [best_term]).get(best_term)
+        term_pos = occurrences[1][0] if occurrences else -1
+        term_end = term_pos + len(best_term)
         
-        if term_pos == -1:
+        if term_pos == -1 or content[term_pos:term_end].lower() != best_term:
             # Termo não encontrado, retorna início do documento
             return content[:context_size * 2] + "..."
         
         # Calcula posições
         start = max(0, term_pos - context_size)
-        end = min(len(content), term_pos + len(best_term) + context_size)
+        end = min(len(content), term_end + context_size)
         
-        # Extrai snippet
-        snippet = content[start:end]
+        # Extrai snippet, destacando a ocorrência
+        snippet = (content[start:term_pos] + f"<mark>{content[term_pos:term_end]}</mark>" +
+                   content[term_end:end])
         
         # Adiciona reticências
         if start > 0:
@@ -215,7 +899,4 @@ class QueryProcessor:
         if end < len(content):
             snippet = snippet + "..."
         
-        pattern = re.compile(re.escape(best_term), re.IGNORECASE)
-        snippet = pattern.sub(lambda m: f"<mark>{m.group()}</mark>", snippet, count=1)
-        
         return snippet
@@ -0,0 +1,63 @@
+"""
+Módulo de Pontuação em Processos
+Avalia as consultas em um pool de processos, fora do GIL do servidor.
+
+Em um único processo, as threads que atendem as requisições disputam o GIL
+e a avaliação das consultas (CPU-bound, em Python) fica serializada. Cada
+processo do pool abre o mesmo índice binário via mmap (MappedIndex), de
+modo que as páginas do arquivo são compartilhadas pelo sistema operacional,
+e devolve apenas o total e os k melhores (doc_id, score). Cache de
+consultas, snippets e documentos continuam no processo do servidor.
+
+Os processos são criados com 'spawn': o servidor já tem threads rodando, e
+um fork com threads ativas pode herdar locks travados.
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from mapped_index import MappedIndex
+from query_processor import QueryProcessor, MAX_EXPANSIONS
+
+
+# QueryProcessor de cada processo do pool, criado por _open_index
+_processor = None
+
+
+def _open_index(index_path, max_expansions, vectorized):
+    global _processor
+    _processor = QueryProcessor(MappedIndex(index_path), max_expansions=max_expansions,
+                                vectorized=vectorized)
+    _processor.warm_up()
+
+
+def _top_k(query_string, k):
+    return _processor._top_k(query_string, k)
+
+
+def _ready():
+    return _processor is not None
+
+
+class ScoringPool:
+    def __init__(self, index_path, workers, max_expansions=MAX_EXPANSIONS, vectorized=True):
+        self.index_path = index_path
+        self.workers = workers
+        self.executor = ProcessPoolExecutor(max_workers=workers,
+                                            mp_context=multiprocessing.get_context('spawn'),
+                                            initializer=_open_index,
+                                            initargs=(index_path, max_expansions, vectorized))
+
+    def start(self):
+        """Cria os processos e abre o índice em todos antes da primeira consulta"""
+        futures = [self.executor.submit(_ready) for _ in range(self.workers)]
+        return all(future.result() for future in futures)
+
+    def top_k(self, query_string, k):
+        """(total, [(doc_id, score)]) da consulta, calculado por um processo do pool.
+
+        A thread que chama só espera o resultado, sem segurar o GIL.
+        """
+        return self.executor.submit(_top_k, query_string, k).result()
+
+    def close(self):
+        self.executor.shutdown()
@@ -0,0 +1,474 @@
+"""
+Módulo de Índice Segmentado
+Divide o índice em segmentos imutáveis (estilo LSM) para ingestão contínua.
+
+As escritas vão para um segmento ativo em memória. Quando ele atinge
+flush_threshold documentos, é selado e passa a ser imutável; remoções em
+segmentos selados são apenas marcadas (tombstones). Um merger em segundo
+plano junta segmentos do mesmo nível de tamanho, descartando os documentos
+removidos, o que mantém o número de segmentos e a amplificação de escrita
+limitados sem nunca reconstruir o índice inteiro.
+
+A leitura expõe a mesma interface do InvertedIndex usada pelo
+QueryProcessor: search_term faz a união das postings de todos os
+segmentos, e as estatísticas de z-score são mantidas globalmente. Segmentos
+selados guardam o dicionário em uma FrozenTrie. Como os
+ids inteiros são locais a cada segmento, as postings unificadas são
+indexadas pelo doc_id (caminho).
+"""
+
+import os
+import json
+import math
+import heapq
+import threading
+from array import array
+from itertools import islice
+from compact_trie import CompactTrie
+from inverted_index import InvertedIndex, term_statistics
+from postings import PostingList, DocFrequencies
+from suggester import Suggester
+
+
+class Segment:
+    def __init__(self, index, path=None):
+        self.index = index  # InvertedIndex com Trie e postings próprias
+        self.deleted = set()  # doc_ids removidos depois da selagem
+        self.path = path  # arquivo onde o segmento foi gravado, se houver
+
+    def freeze(self):
+        # Segmentos selados não alteram mais a Trie: usa a forma compacta em arrays
+        self.index.trie = self.index.trie.freeze()
+        return self
+
+    @property
+    def live_docs(self):
+        return self.index.total_docs - len(self.deleted)
+
+    def search_term(self, term, result):
+        """Acumula em result as frequências {doc_id: tf} dos documentos vivos"""
+        postings = self.index.trie.get(term)
+        if postings is None:
+            return
+
+        doc_ids = self.index.doc_ids
+        for number, freq in zip(postings.ids, postings.tfs):
+            doc_id = doc_ids[number]
+            if doc_id not in self.deleted:
+                result[doc_id] = freq
+
+
+class SegmentedIndex:
+    def __init__(self, flush_threshold=100, merge_factor=4, positional=False):
+        self.flush_threshold = flush_threshold
+        self.merge_factor = merge_factor
+        self.positional = positional  # segmentos guardam as posições dos termos
+
+        self.segments = []  # segmentos selados, do mais antigo ao mais novo
+        self.active = Segment(InvertedIndex(positional))  # segmento que recebe as escritas
+        self.locations = {}  # {doc_id: segmento onde está a versão viva}
+        self.next_segment = 0  # numeração dos arquivos de segmento
+
+        # Estatísticas globais, somadas sobre os documentos vivos
+        self.corpus_term_freq = {}
+        self.doc_freq = {}
+        self.term_sq_freq = {}
+        self.total_docs = 0
+        self.total_length = 0
+        self.version = 0  # incrementada a cada alteração (invalida caches de consultas)
+        self._suggester = None  # Suggester montado na primeira sugestão
+        self._suggest_changes = set()  # termos alterados desde a última sugestão
+        self._suggest_lock = threading.Lock()
+
+        self._lock = threading.Lock()
+        self._merge_event = threading.Event()
+        self._merge_thread = None
+        self._stop_merger = False
+
+    @classmethod
+    def from_index(cls, index, **kwargs):
+        """Usa um InvertedIndex já construído como segmento principal"""
+        segmented = cls(**kwargs)
+        segment = Segment(index)
+        segmented.segments.append(segment)
+
+        segmented._add_segment_statistics(segment)
+        return segmented
+
+    def _add_segment_statistics(self, segment):
+        # Soma as estatísticas do segmento e desconta os documentos removidos;
+        # o Suggester é remontado na próxima sugestão
+        self._suggester = None
+        index = segment.index
+        for term, total_freq in index.corpus_term_freq.items():
+            self.corpus_term_freq[term] = self.corpus_term_freq.get(term, 0) + total_freq
+            self.doc_freq[term] = self.doc_freq.get(term, 0) + index.doc_freq[term]
+            self.term_sq_freq[term] = self.term_sq_freq.get(term, 0) + index.term_sq_freq[term]
+        self.total_docs += index.total_docs
+        self.total_length += sum(index.doc_lengths.values())
+
+        for doc_id in index.documents:
+            if doc_id in segment.deleted:
+                self._update_statistics(index.get_document_terms(doc_id),
+                                        index.doc_lengths.get(doc_id, 0), -1)
+            else:
+                self.locations[doc_id] = segment
+
+    def _update_statistics(self, term_freq, length, sign):
+        if self._suggester is not None:
+            self._suggest_changes.update(term_freq)
+
+        for term, freq in term_freq.items():
+            doc_freq = self.doc_freq.get(term, 0) + sign
+            if doc_freq <= 0:
+                self.corpus_term_freq.pop(term, None)
+                self.doc_freq.pop(term, None)
+                self.term_sq_freq.pop(term, None)
+                continue
+
+            self.doc_freq[term] = doc_freq
+            self.corpus_term_freq[term] = self.corpus_term_freq.get(term, 0) + sign * freq
+            self.term_sq_freq[term] = self.term_sq_freq.get(term, 0) + sign * freq * freq
+
+        self.total_docs += sign
+        self.total_length += sign * length
+
+    # Escrita
+
+    def add_document(self, doc_id, title, content, category, path=""):
+        with self._lock:
+            self._remove_locked(doc_id)
+
+            active = self.active.index
+            active.add_document(doc_id, title, content, category, path)
+            self.locations[doc_id] = self.active
+            self._update_statistics(active.get_document_terms(doc_id), active.doc_lengths[doc_id], 1)
+            self.version += 1
+
+            if active.total_docs >= self.flush_threshold:
+                self._seal_active_locked()
+
+    def update_document(self, doc_id, title, content, category, path=""):
+        if doc_id not in self.locations:
+            raise KeyError(doc_id)
+
+        self.add_document(doc_id, title, content, category, path)
+
+    def remove_document(self, doc_id):
+        with self._lock:
+            return self._remove_locked(doc_id)
+
+    def _remove_locked(self, doc_id):
+        segment = self.locations.pop(doc_id, None)
+        if segment is None:
+            return False
+
+        index = segment.index
+        self._update_statistics(index.get_document_terms(doc_id), index.doc_lengths.get(doc_id, 0), -1)
+
+        if segment is self.active:
+            # O segmento ativo ainda é mutável
+            index.remove_document(doc_id)
+        else:
+            segment.deleted.add(doc_id)
+        self.version += 1
+        return True
+
+    def flush(self):
+        """Sela o segmento ativo, se houver documentos nele"""
+        with self._lock:
+            if self.active.index.total_docs > 0:
+                self._seal_active_locked()
+
+    def _seal_active_locked(self):
+        # O journal do InvertedIndex não é usado; segmentos são gravados inteiros
+        self.active.index.pending_changes = []
+        self.active.freeze()
+
+        # A lista é substituída (copy-on-write) para não afetar leituras em andamento
+        self.segments = self.segments + [self.active]
+        self.active = Segment(InvertedIndex(self.positional))
+        self._merge_event.set()
+
+    # Merge por níveis de tamanho
+
+    def _tier(self, segment):
+        size = max(segment.live_docs, 1) / self.flush_threshold
+        return max(0, int(math.log(size, self.merge_factor))) if size > 1 else 0
+
+    def _pick_merge(self):
+        tiers = {}
+        for segment in self.segments:
+            tiers.setdefault(self._tier(segment), []).append(segment)
+
+        # Junta o nível mais baixo que acumulou merge_factor segmentos
+        for tier in sorted(tiers):
+            if len(tiers[tier]) >= self.merge_factor:
+                return tiers[tier][:self.merge_factor]
+        return None
+
+    def maybe_merge(self):
+        """Executa merges enquanto algum nível tiver segmentos demais; retorna quantos fez"""
+        merges = 0
+        while True:
+            with self._lock:
+                candidates = self._pick_merge()
+                if not candidates:
+                    return merges
+                deleted = [set(segment.deleted) for segment in candidates]
+
+            # A construção do novo segmento ocorre fora do lock
+            merged = Segment(_merge_segments(candidates, deleted)).freeze()
+
+            with self._lock:
+                # Remoções feitas durante o merge continuam como tombstones
+                for segment, snapshot in zip(candidates, deleted):
+                    merged.deleted.update(segment.deleted - snapshot)
+
+                for doc_id in merged.index.documents:
+                    if self.locations.get(doc_id) in candidates:
+                        self.locations[doc_id] = merged
+
+                position = self.segments.index(candidates[0])
+                remaining = [segment for segment in self.segments if segment not in candidates]
+                remaining.insert(min(position, len(remaining)), merged)
+                self.segments = remaining
+
+            merges += 1
+
+    def start_background_merge(self, interval=1.0):
+        """Inicia a thread que compacta os segmentos periodicamente"""
+        if self._merge_thread is not None:
+            return
+
+        self._stop_merger = False
+        self._merge_thread = threading.Thread(target=self._merge_loop, args=(interval,), daemon=True)
+        self._merge_thread.start()
+
+    def stop_background_merge(self):
+        if self._merge_thread is None:
+            return
+
+        self._stop_merger = True
+        self._merge_event.set()
+        self._merge_thread.join()
+        self._merge_thread = None
+
+    def _merge_loop(self, interval):
+        while not self._stop_merger:
+            self._merge_event.wait(interval)
+            self._merge_event.clear()
+            if not self._stop_merger:
+                self.maybe_merge()
+
+    # Leitura (mesma interface do InvertedIndex)
+
+    def search_term(self, term):
+        # Segmentos selados são imutáveis e dispensam lock
+        docs = DocFrequencies()
+        for segment in self.segments:
+            segment.search_term(term, docs)
+
+        # O segmento ativo pode estar dividindo nós da Trie neste momento
+        with self._lock:
+            self.active.search_term(term, docs)
+        return docs
+
+    def get_doc_id(self, doc_id):
+        # As postings unificadas já são indexadas pelo doc_id
+        return doc_id
+
+    def suggest(self, prefix, k=10):
+        """Retorna [(termo, frequência)] dos k termos mais frequentes com o prefixo.
+
+        Depois de escritas, apenas os termos alterados são atualizados no Suggester.
+        """
+        with self._suggest_lock:
+            with self._lock:
+                if self._suggester is None:
+                    items = sorted(self.corpus_term_freq.items())
+                    changes = None
+                else:
+                    changes = {term: self.corpus_term_freq.get(term, 0)
+                               for term in self._suggest_changes}
+                self._suggest_changes = set()
+
+            # Montagem e atualização fora do lock de escrita
+            if changes is None:
+                self._suggester = Suggester(items)
+            elif changes:
+                self._suggester.update(changes)
+            return self._suggester.suggest(prefix, k)
+
+    def expand_prefix(self, prefix, limit=None):
+        """Termos com o prefixo em algum documento vivo, em ordem alfabética.
+
+        Junta os termos de cada segmento (já ordenados) com um merge, parando
+        depois de limit termos distintos.
+        """
+        # O segmento ativo é pequeno; seus termos são copiados sob o lock
+        with self._lock:
+            active = [term for term, _ in self.active.index.trie.iter_prefix(prefix)]
+        sources = [(term for term, _ in segment.index.trie.iter_prefix(prefix))
+                   for segment in self.segments]
+
+        def live_terms():
+            last = None
+            for term in heapq.merge(active, *sources):
+                if term != last and self.corpus_term_freq.get(term):
+                    yield term
+                last = term
+
+        return list(islice(live_terms(), limit))
+
+    def expand_fuzzy(self, term, max_edits, limit=None):
+        """Termos vivos a no máximo max_edits edições de term, dos mais próximos para os mais distantes"""
+        with self._lock:
+            matches = self.active.index.trie.fuzzy_search(term, max_edits)
+        for segment in self.segments:
+            matches.extend(segment.index.trie.fuzzy_search(term, max_edits))
+
+        # A distância depende só do termo, então repetições entre segmentos coincidem
+        words = {(distance, word) for word, _, distance in matches
+                 if self.corpus_term_freq.get(word)}
+        return [word for _, word in sorted(words)[:limit]]
+
+    def get_term_frequency(self, doc_id, term):
+        segment = self.locations.get(doc_id)
+        if segment is None:
+            return 0
+        return segment.index.get_term_frequency(doc_id, term)
+
+    def get_term_positions(self, doc_id, terms):
+        segment = self.locations.get(doc_id)
+        if segment is None:
+            return {}
+        return segment.index.get_term_positions(doc_id, terms)
+
+    def get_term_statistics(self, term):
+        term = term.lower()
+        return term_statistics(self.corpus_term_freq.get(term, 0),
+                               self.term_sq_freq.get(term, 0),
+                               self.doc_freq.get(term, 0),
+                               self.total_docs)
+
+    def get_document(self, doc_id, content=True):
+        segment = self.locations.get(doc_id)
+        if segment is None:
+            return None
+        return segment.index.get_document(doc_id, content)
+
+    def get_content(self, doc_id):
+        segment = self.locations.get(doc_id)
+        if segment is None:
+            return None
+        return segment.index.get_content(doc_id)
+
+    def get_statistics(self):
+        return {
+            'total_documents': self.total_docs,
+            'unique_terms': len(self.corpus_term_freq),
+            'total_terms': sum(self.corpus_term_freq.values()),
+            'avg_doc_length': self.total_length / self.total_docs if self.total_docs > 0 else 0,
+            'segments': len(self.segments) + 1
+        }
+
+    # Persistência: cada segmento selado é gravado uma única vez
+
+    def save(self, directory):
+        self.flush()
+        os.makedirs(directory, exist_ok=True)
+
+        with self._lock:
+            segments = list(self.segments)
+            manifest = []
+            for segment in segments:
+                if segment.path is None:
+                    segment.path = f"segment_{self.next_segment:06d}.bin"
+                    self.next_segment += 1
+                    segment.index.save_index(os.path.join(directory, segment.path))
+                manifest.append({'file': segment.path, 'deleted': sorted(segment.deleted)})
+
+        # O manifesto é trocado atomicamente
+        manifest_path = os.path.join(directory, 'manifest.json')
+        with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'segments': manifest, 'next_segment': self.next_segment}, f, ensure_ascii=False)
+        os.replace(manifest_path + '.tmp', manifest_path)
+
+        # Arquivos de segmentos já compactados não são mais referenciados
+        referenced = {entry['file'] for entry in manifest}
+        for filename in os.listdir(directory):
+            if filename.startswith('segment_') and filename not in referenced:
+                os.remove(os.path.join(directory, filename))
+
+    @classmethod
+    def load(cls, directory, **kwargs):
+        with open(os.path.join(directory, 'manifest.json'), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+
+        segmented = cls(**kwargs)
+        segmented.next_segment = manifest['next_segment']
+        for entry in manifest['segments']:
+            index = InvertedIndex(segmented.positional)
+            if not index.load_index(os.path.join(directory, entry['file'])):
+                raise ValueError(f"Segmento inválido: {entry['file']}")
+
+            segment = Segment(index, entry['file']).freeze()
+            segment.deleted = set(entry['deleted'])
+            segmented.segments.append(segment)
+            segmented._add_segment_statistics(segment)
+
+        return segmented
+
+
+def _merge_segments(segments, deleted):
+    """Constrói um novo InvertedIndex com os documentos vivos dos segmentos.
+
+    As postings de cada segmento são renumeradas e concatenadas; como os
+    segmentos são percorridos em ordem, os ids continuam ordenados e nenhum
+    documento precisa ser tokenizado de novo.
+    """
+    # Segmentos com posições as repassam; documentos vindos de segmentos sem
+    # posições as recalculam sob demanda
+    merged = InvertedIndex(any(segment.index.positional for segment in segments))
+    term_postings = {}
+
+    for segment, removed in zip(segments, deleted):
+        index = segment.index
+
+        # Novos ids para os documentos vivos do segmento
+        renumber = {}
+        for number, doc_id in enumerate(index.doc_ids):
+            if doc_id is None or doc_id in removed:
+                continue
+            renumber[number] = merged._assign_number(doc_id)
+            if number in index.positions:
+                merged.positions[renumber[number]] = index.positions[number]
+            merged.documents[doc_id] = index.documents[doc_id]
+            merged.bodies.put(renumber[number], index.bodies.read(number))
+            merged.doc_lengths[doc_id] = index.doc_lengths.get(doc_id, 0)
+            merged.total_docs += 1
+
+        for term, postings in index.trie.get_all_words():
+            ids = array('I')
+            tfs = array('I')
+            for number, freq in zip(postings.ids, postings.tfs):
+                if number in renumber:
+                    ids.append(renumber[number])
+                    tfs.append(freq)
+            if not ids:
+                continue
+
+            if term in term_postings:
+                term_postings[term].ids.extend(ids)
+                term_postings[term].tfs.extend(tfs)
+            else:
+                term_postings[term] = PostingList(ids, tfs)
+
+    merged.trie = CompactTrie.from_sorted(sorted(term_postings.items()), PostingList)
+    for term, postings in term_postings.items():
+        merged.corpus_term_freq[term] = sum(postings.tfs)
+        merged.doc_freq[term] = len(postings)
+        merged.term_sq_freq[term] = sum(freq * freq for freq in postings.tfs)
+
+    return merged
@@ -0,0 +1,81 @@
+"""
+Servidor de Produção para Máquina de Busca
+Atende requisições concorrentes com um pool fixo de threads e, opcionalmente,
+avalia as consultas em um pool de processos (ver scoring_pool).
+
+O servidor de desenvolvimento do Flask (app.py) atende uma requisição por
+vez. Aqui cada conexão aceita é entregue a um ThreadPoolExecutor de tamanho
+fixo, e as threads dividem o mesmo índice e o mesmo QueryCache pelo caminho
+de leitura sem locks de QueryProcessor. Com processos de pontuação, as
+threads só esperam os resultados enquanto o ranking roda fora do GIL.
+
+Uso:
+    python server.py --threads 8 --processes 4 --port 8000
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+import app as search_app
+
+
+class RequestHandler(WSGIRequestHandler):
+    # Uma requisição por conexão: com keep-alive, uma conexão ociosa prenderia
+    # uma thread do pool fixo até o timeout
+    protocol_version = 'HTTP/1.0'
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """Servidor WSGI que atende cada conexão em uma thread de um pool fixo"""
+
+    multithread = True
+
+    def __init__(self, host, port, wsgi_app, threads):
+        super().__init__(host, port, wsgi_app, handler=RequestHandler)
+        self.threads = threads
+        self.executor = ThreadPoolExecutor(max_workers=threads)
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self._process_request, request, client_address)
+
+    def _process_request(self, request, client_address):
+        # Mesmo tratamento de socketserver.ThreadingMixIn.process_request_thread
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor da máquina de busca")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--threads', type=int, default=search_app.SERVER_THREADS,
+                        help="threads que atendem as requisições")
+    parser.add_argument('--processes', type=int, default=search_app.SCORING_PROCESSES,
+                        help="processos que avaliam as consultas (0 avalia nas threads)")
+    args = parser.parse_args()
+
+    print("=== Máquina de Busca BBC News ===")
+    print("Inicializando...")
+    search_app.initialize_index(scoring_processes=args.processes)
+
+    server = PooledWSGIServer(args.host, args.port, search_app.app, args.threads)
+    print(f"Servidor com {args.threads} threads e {args.processes} processos de pontuação")
+    print(f"Acesse: http://localhost:{server.port}")
+    print("================================\n")
+
+    try:
+        server.serve_forever()
+    finally:
+        search_app.close_scoring_pool()
+
+
+if __name__ == '__main__':
+    main()
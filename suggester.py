@@ -0,0 +1,43 @@
+"""
+Módulo de Autocompletar
+Sugere os termos mais frequentes do corpus que começam com um prefixo.
+
+O Suggester monta uma Trie Compacta só com o vocabulário (sem documentos)
+e anota cada nó com os k termos mais frequentes da sua subárvore, de modo
+que uma sugestão custa apenas a descida pelo prefixo. Depois de alterações
+no índice, update refaz só as anotações dos caminhos dos termos alterados.
+"""
+
+from compact_trie import CompactTrie
+
+
+class Suggester:
+    def __init__(self, term_frequencies, k=10):
+        """term_frequencies: pares (termo, frequência no corpus) em ordem lexicográfica"""
+        self.k = k
+        self.frequencies = {}
+
+        def items():
+            for term, freq in term_frequencies:
+                self.frequencies[term] = freq
+                yield term, ()
+
+        # tuple() é compartilhada por todos os nós: a Trie não guarda documentos
+        self.trie = CompactTrie.from_sorted(items(), tuple)
+        self.trie.build_completions(self.frequencies, k)
+
+    def update(self, frequencies):
+        """Aplica as novas frequências {termo: frequência} dos termos alterados; 0 remove o termo"""
+        for term, freq in frequencies.items():
+            if freq > 0:
+                self.frequencies[term] = freq
+                self.trie.setdefault(term)
+            elif self.frequencies.pop(term, None) is None:
+                continue
+            self.trie.update_completions(term, self.frequencies, self.k)
+
+    def suggest(self, prefix, k=None):
+        """Retorna [(termo, frequência)] dos termos mais frequentes com o prefixo"""
+        if not prefix:
+            return []
+        return self.trie.top_completions(prefix, min(k or self.k, self.k))
@@ -3,9 +3,26 @@ Script de Teste para a Trie Compacta e Índice Invertido
 Algoritmos 2 - TP1
 """
 
+import os
+import tempfile
+import threading
+from array import array
 from compact_trie import CompactTrie, TrieNode
+from document_store import DocumentStore
 from inverted_index import InvertedIndex
+from mapped_index import MappedIndex
+from matrix_scorer import HAS_NUMPY
+from postings import PostingList, RoaringBitmap
 from query_processor import QueryProcessor
+from query_cache import QueryCache
+from scoring_pool import ScoringPool
+from segmented_index import SegmentedIndex
+from suggester import Suggester
+
+
+def doc_ids(index, docs):
+    """Converte o resultado de search_term nos doc_ids (caminhos)"""
+    return {index.get_doc_id(doc) for doc in docs}
 
 
 def test_compact_trie():
@@ -58,6 +75,64 @@ def test_compact_trie():
     assert result_original == result_restored
     print("✓ Passou\n")
     
+    # Teste 5: Busca exata não retorna palavras mais longas
+    print("Teste 5: Busca exata de prefixo de aresta")
+    trie3 = CompactTrie()
+    trie3.insert("testing", "doc1")
+    result = trie3.search("test")
+    print(f"Busca por 'test': {result}")
+    assert result == set(), "Erro: 'test' não foi inserida"
+    print("✓ Passou\n")
+    
+    # Teste 6: Trie congelada em arrays com a mesma semântica
+    print("Teste 6: Trie congelada")
+    trie.insert("tea", "doc4")
+    trie.insert("team", "doc5")
+    frozen = trie.freeze()
+    for word in ["test", "tes", "testing", "tea", "team", "te", "x", ""]:
+        assert frozen.search(word) == trie.search(word), word
+        assert frozen.starts_with(word) == trie.starts_with(word), word
+    assert frozen.get_all_words() == sorted(trie.get_all_words())
+    print(f"Palavras: {[word for word, _ in frozen.get_all_words()]}")
+    print("✓ Passou\n")
+    
+    # Teste 7: Travessias iterativas em Trie mais profunda que o limite de recursão
+    print("Teste 7: Trie profunda")
+    deep = CompactTrie()
+    for length in range(1, 1500):
+        deep.insert("a" * length, length)
+    assert len(deep.starts_with("a")) == 1499
+    assert len(deep.get_all_words()) == 1499
+    restored = CompactTrie.from_dict(deep.to_dict())
+    assert restored.search("a" * 1499) == {1499}
+    print("✓ Passou\n")
+    
+    # Teste 8: Construção em lote a partir de palavras ordenadas
+    print("Teste 8: Construção em lote")
+    words = sorted(["test", "testing", "tester", "tea", "team", "to", "a"])
+    bulk = CompactTrie.from_sorted((word, {i}) for i, word in enumerate(words))
+    inserted = CompactTrie()
+    for i, word in enumerate(words):
+        inserted.insert(word, i)
+    assert bulk.to_dict() == inserted.to_dict()
+    try:
+        CompactTrie.from_sorted([("b", None), ("a", None)])
+        assert False, "Palavras fora de ordem deveriam ser rejeitadas"
+    except ValueError:
+        pass
+    print("✓ Passou\n")
+    
+    # Teste 9: Busca aproximada (distância de edição)
+    print("Teste 9: Busca aproximada")
+    fuzzy = [(word, distance) for word, _, distance in bulk.fuzzy_search("tast", 1)]
+    print(f"'tast' com 1 edição: {fuzzy}")
+    assert fuzzy == [("test", 1)]
+    assert [word for word, _, _ in bulk.fuzzy_search("tes", 2)] == ["tea", "team", "test", "to"]
+    assert [result[0] for result in bulk.freeze().fuzzy_search("tes", 2)] == \
+        [result[0] for result in bulk.fuzzy_search("tes", 2)]
+    assert bulk.fuzzy_search("testing", 0)[0][0] == "testing"
+    print("✓ Passou\n")
+    
     print("=== Todos os testes da Trie passaram! ===\n")
 
 
@@ -69,28 +144,9 @@ def test_query_processor():
     index = InvertedIndex()
     
     # Simula alguns documentos
-    index.documents = {
-        "doc1": {"title": "Doc 1", "content": "economy growth", "category": "business", "path": ""},
-        "doc2": {"title": "Doc 2", "content": "economy recession", "category": "business", "path": ""},
-        "doc3": {"title": "Doc 3", "content": "growth market", "category": "business", "path": ""},
-    }
-    
-    # Indexa manualmente
-    index.trie.insert("economy", "doc1")
-    index.trie.insert("growth", "doc1")
-    index.trie.insert("economy", "doc2")
-    index.trie.insert("recession", "doc2")
-    index.trie.insert("growth", "doc3")
-    index.trie.insert("market", "doc3")
-    
-    index.term_frequencies = {
-        "doc1": {"economy": 1, "growth": 1},
-        "doc2": {"economy": 1, "recession": 1},
-        "doc3": {"growth": 1, "market": 1},
-    }
-    index.doc_lengths = {"doc1": 2, "doc2": 2, "doc3": 2}
-    index.corpus_term_freq = {"economy": 2, "growth": 2, "recession": 1, "market": 1}
-    index.total_docs = 3
+    index.add_document("doc1", "Doc 1", "economy growth", "business")
+    index.add_document("doc2", "Doc 2", "economy recession", "business")
+    index.add_document("doc3", "Doc 3", "growth market", "business")
     
     processor = QueryProcessor(index)
     
@@ -122,9 +178,743 @@ def test_query_processor():
     assert len(results) == 2, "Deveria encontrar 2 documentos"
     print("✓ Passou\n")
     
+    # Teste 5: Top-k
+    print("Teste 5: Top-k com heap limitado")
+    total, top = processor.process_query_top_k("economy OR market", 2)
+    print(f"Top-2 'economy OR market': {top} de {total}")
+    assert total == 3 and top == processor.process_query("economy OR market")[:2]
+    print("✓ Passou\n")
+    
+    # Teste 6: Plano com operandos achatados, ordenados e sem repetição
+    print("Teste 6: Plano de execução")
+    plan = processor.explain("economy AND (market AND growth) AND economy")
+    print(f"Plano: {plan}")
+    assert plan['op'] == 'AND'
+    assert [child['df'] for child in plan['children']] == [1, 2, 2]
+    assert [child['term'] for child in plan['children']][0] == "market"
+    results = processor.process_query("(economy OR market) AND (market OR economy) AND growth")
+    assert sorted(r[0] for r in results) == ["doc1", "doc3"]
+    assert processor.process_query("recession AND missing AND economy") == []
+    print("✓ Passou\n")
+    
+    # Teste 7: MaxScore devolve o mesmo top-k da avaliação exaustiva
+    print("Teste 7: Top-k com MaxScore")
+    index.add_document("doc4", "Doc 4", "market market growth economy", "business")
+    index.add_document("doc5", "Doc 5", "recession recession market", "business")
+    query = "economy OR growth OR economy OR market OR recession"
+    for k in range(1, 6):
+        total, top = processor.process_query_top_k(query, k)
+        assert total == 5 and top == processor.process_query(query)[:k]
+    # Termo em todos os documentos (desvio padrão zero) continua trazendo seus documentos
+    uniform = InvertedIndex()
+    uniform.add_document("d0", "D0", "rare common", "business")
+    uniform.add_document("d1", "D1", "common", "business")
+    uniform.add_document("d2", "D2", "common", "business")
+    uniform_processor = QueryProcessor(uniform, vectorized=False)
+    for k in range(1, 4):
+        total, top = uniform_processor.process_query_top_k("rare OR common", k)
+        assert total == 3 and top == uniform_processor.process_query("rare OR common")[:k]
+    # Disjunção larga: mesmo top-k, com apenas parte dos candidatos pontuada
+    wide = InvertedIndex()
+    words = ["alpha", "beta", "gamma", "delta", "epsilon", "zeta", "theta", "kappa"]
+    for i in range(1500):
+        text = " ".join(" ".join([word] * (1 + (i // (j + 2)) % 4))
+                        for j, word in enumerate(words) if i % (j + 2) == 0)
+        wide.add_document(f"w{i}", f"W{i}", text or "filler", "business")
+    wide_processor = QueryProcessor(wide, vectorized=False)
+    ranked_score = wide_processor._ranked_score
+    scored = []
+    wide_processor._ranked_score = lambda *args: scored.append(args) or ranked_score(*args)
+    query = " OR ".join(words)
+    for k in (1, 5, 20):
+        del scored[:]
+        total, top = wide_processor.process_query_top_k(query, k)
+        assert top == wide_processor.process_query(query)[:k]
+        print(f"k={k}: {len(scored)} de {total} candidatos pontuados")
+        assert 0 < len(scored) < total // 10
+    print("✓ Passou\n")
+    
+    # Teste 8: Prefixo equivale ao OR dos termos expandidos
+    print("Teste 8: Busca por prefixo")
+    index.add_document("doc6", "Doc 6", "export employment economy", "business")
+    assert index.expand_prefix("e") == ["economy", "employment", "export"]
+    assert index.expand_prefix("e", 2) == ["economy", "employment"]
+    assert processor.process_query("(mar* OR rec*) AND gr*") == \
+        processor.process_query("(market OR recession) AND growth")
+    assert processor.process_query("xyz* OR economy") == processor.process_query("economy")
+    assert processor.process_query("xyz* AND economy") == []
+    limited = QueryProcessor(index, max_expansions=2)
+    assert limited.explain("e* AND growth")['children'][1]['truncated']
+    # Exatamente max_expansions termos: a expansão não foi cortada
+    exact = QueryProcessor(index, max_expansions=3).explain("e*")
+    assert exact['terms'] == ["economy", "employment", "export"] and not exact['truncated']
+    # Seis termos distintos, com expansões de prefixo
+    query = "e* OR g* OR m* OR r* OR xyz*"
+    for k in range(1, 7):
+        total, top = processor.process_query_top_k(query, k)
+        assert total == 6 and top == processor.process_query(query)[:k]
+    print("✓ Passou\n")
+    
+    # Teste 9: Termos aproximados, dos mais próximos para os mais distantes
+    print("Teste 9: Busca aproximada")
+    assert index.expand_fuzzy("ecnmy", 2) == ["economy"]
+    assert index.expand_fuzzy("markte", 2, 1) == ["market"]
+    assert processor.process_query("ecnmy~1") == []
+    assert processor.process_query("ecnmy~ AND grwth~1") == processor.process_query("economy AND growth")
+    assert processor.explain("markt~1")['terms'] == ["market"]
+    print("✓ Passou\n")
+    
     print("=== Todos os testes de consulta passaram! ===\n")
 
 
+def test_term_statistics():
+    """Testa a tabela de estatísticas por termo usada no z-score"""
+    print("=== Testando Estatísticas por Termo ===\n")
+    
+    index = InvertedIndex()
+    index._index_document_terms("doc1", ["economy", "economy", "growth"])
+    index._index_document_terms("doc2", ["economy", "recession"])
+    index.total_docs = 2
+    
+    # Compara com o cálculo direto sobre todos os documentos
+    print("Teste 1: Média e desvio padrão")
+    mean, std, df = index.get_term_statistics("economy")
+    freqs = [2, 1]
+    expected_mean = sum(freqs) / 2
+    expected_std = (sum((f - expected_mean) ** 2 for f in freqs) / 2) ** 0.5
+    print(f"economy: média={mean}, desvio={std}, df={df}")
+    assert df == 2 and abs(mean - expected_mean) < 1e-12 and abs(std - expected_std) < 1e-12
+    print("✓ Passou\n")
+    
+    # Adicionar um documento mantém a tabela correta
+    print("Teste 2: Atualização ao adicionar documento")
+    index._index_document_terms("doc3", ["growth"])
+    index.total_docs = 3
+    mean, std, df = index.get_term_statistics("growth")
+    expected_std = (sum((f - 2 / 3) ** 2 for f in [1, 0, 1]) / 3) ** 0.5
+    assert df == 2 and abs(mean - 2 / 3) < 1e-12 and abs(std - expected_std) < 1e-12
+    print("✓ Passou\n")
+    
+    print("=== Todos os testes de estatísticas passaram! ===\n")
+
+
+def test_binary_index():
+    """Testa a gravação e leitura do índice no formato binário"""
+    print("=== Testando Persistência Binária ===\n")
+    
+    index = InvertedIndex()
+    index.add_document("business/001.txt", "Doc 1", "economy growth economy", "business")
+    index.add_document("tech/002.txt", "Doc 2", "economy of the internet", "tech")
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "index.bin")
+        index.save_index(path)
+        
+        restored = InvertedIndex()
+        assert restored.load_index(path), "Erro: índice binário não carregou"
+        
+        print("Teste 1: Estruturas restauradas")
+        assert restored.documents == index.documents
+        assert restored.get_document("tech/002.txt")["content"] == "economy of the internet"
+        assert restored.doc_ids == index.doc_ids
+        assert restored.get_term_statistics("economy") == index.get_term_statistics("economy")
+        assert restored.get_term_frequency("business/001.txt", "economy") == 2
+        assert doc_ids(restored, restored.search_term("economy")) == {"business/001.txt", "tech/002.txt"}
+        print("✓ Passou\n")
+        
+        print("Teste 2: Leitura via mmap")
+        mapped = MappedIndex(path)
+        assert mapped.search_term("economy") == index.search_term("economy")
+        assert mapped.get_term_frequency("business/001.txt", "economy") == 2
+        assert mapped.get_term_statistics("growth") == index.get_term_statistics("growth")
+        assert mapped.get_document("tech/002.txt") == index.get_document("tech/002.txt")
+        assert mapped.get_statistics() == index.get_statistics()
+        mapped.close()
+        print("✓ Passou\n")
+        
+        # Teste 3: Arquivo corrompido é rejeitado pelo checksum
+        print("Teste 3: Checksum")
+        with open(path, 'r+b') as f:
+            f.seek(40)
+            byte = f.read(1)
+            f.seek(40)
+            f.write(bytes([byte[0] ^ 0xFF]))
+        assert not InvertedIndex().load_index(path), "Erro: arquivo corrompido foi aceito"
+        print("✓ Passou\n")
+    
+    print("=== Todos os testes de persistência passaram! ===\n")
+
+
+def test_parallel_indexing():
+    """Testa se a indexação paralela produz o mesmo índice da sequencial"""
+    print("=== Testando Indexação Paralela ===\n")
+    
+    with tempfile.TemporaryDirectory() as corpus_path:
+        # Corpus pequeno com duas categorias
+        texts = {
+            "business": ["Economy grows\neconomy growth market", "Markets fall\nrecession fears hit the market"],
+            "tech": ["New phones\nthe economy of phones", "Chips\nchip market growth"],
+        }
+        for category, docs in texts.items():
+            os.makedirs(os.path.join(corpus_path, category))
+            for i, text in enumerate(docs):
+                with open(os.path.join(corpus_path, category, f"{i:03d}.txt"), 'w') as f:
+                    f.write(text)
+        
+        sequential = InvertedIndex()
+        sequential.index_documents(corpus_path)
+        parallel = InvertedIndex()
+        parallel.index_documents(corpus_path, workers=2)
+        
+        sequential_path = os.path.join(corpus_path, "seq.bin")
+        parallel_path = os.path.join(corpus_path, "par.bin")
+        sequential.save_index(sequential_path)
+        parallel.save_index(parallel_path)
+        
+        print("Teste 1: Arquivos idênticos")
+        with open(sequential_path, 'rb') as f1, open(parallel_path, 'rb') as f2:
+            assert f1.read() == f2.read(), "Erro: índices diferentes"
+        assert sequential.trie.get_all_words() == parallel.trie.get_all_words()
+        print("✓ Passou\n")
+        
+        # Teste 2: Indexar o corpus em um índice que já tem documentos
+        print("Teste 2: Indexação em índice populado")
+        populated = InvertedIndex()
+        populated.add_document("extra/000.txt", "Extra", "market economy news", "extra")
+        populated.index_documents(corpus_path)
+        for term, doc_freq in populated.doc_freq.items():
+            assert len(populated.search_term(term)) == doc_freq, term
+        assert len(populated.search_term("market")) == len(sequential.search_term("market")) + 1
+        assert doc_ids(populated, populated.search_term("economy")) == \
+            doc_ids(sequential, sequential.search_term("economy")) | {"extra/000.txt"}
+        print("✓ Passou\n")
+    
+    print("=== Todos os testes de indexação passaram! ===\n")
+
+
+def test_incremental_indexing():
+    """Testa adição, atualização e remoção de documentos sem reconstruir o índice"""
+    print("=== Testando Indexação Incremental ===\n")
+    
+    index = InvertedIndex()
+    index.add_document("doc1", "Doc 1", "economy growth economy", "business")
+    index.add_document("doc2", "Doc 2", "economy recession", "business")
+    index.add_document("doc3", "Doc 3", "testing tester", "tech")
+    
+    # Teste 1: Remoção poda a Trie e ajusta as estatísticas
+    print("Teste 1: Remoção de documento")
+    assert index.remove_document("doc3")
+    assert not index.remove_document("doc3")
+    assert len(index.search_term("tester")) == 0
+    assert "testing" not in [word for word, _ in index.trie.get_all_words()]
+    assert index.total_docs == 2 and "tester" not in index.corpus_term_freq
+    print("✓ Passou\n")
+    
+    # Teste 2: Atualização equivale a indexar o novo conteúdo do zero
+    print("Teste 2: Atualização de documento")
+    index.update_document("doc2", "Doc 2", "growth market", "business")
+    expected = InvertedIndex()
+    expected.add_document("doc1", "Doc 1", "economy growth economy", "business")
+    expected.add_document("doc2", "Doc 2", "growth market", "business")
+    assert doc_ids(index, index.search_term("economy")) == {"doc1"}
+    assert index.corpus_term_freq == expected.corpus_term_freq
+    assert index.get_term_statistics("growth") == expected.get_term_statistics("growth")
+    print("✓ Passou\n")
+    
+    # Teste 3: Journal com apenas as alterações
+    print("Teste 3: Persistência do delta")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "index.bin")
+        index.save_index(path)
+        index.add_document("doc4", "Doc 4", "economy news", "business")
+        index.remove_document("doc1")
+        assert index.save_delta(path) == 2
+        
+        restored = InvertedIndex()
+        assert restored.load_index(path)
+        assert restored.documents == index.documents
+        assert doc_ids(restored, restored.search_term("economy")) == {"doc4"}
+    print("✓ Passou\n")
+    
+    print("=== Todos os testes de indexação incremental passaram! ===\n")
+
+
+def test_segmented_index():
+    """Testa o índice segmentado com merge de segmentos"""
+    print("=== Testando Índice Segmentado ===\n")
+    
+    texts = ["economy growth", "economy recession", "growth market", "market news",
+             "economy news", "sport news", "economy sport", "market growth"]
+    
+    segmented = SegmentedIndex(flush_threshold=2, merge_factor=2)
+    reference = InvertedIndex()
+    for i, text in enumerate(texts):
+        segmented.add_document(f"doc{i}", f"Doc {i}", text, "business")
+        reference.add_document(f"doc{i}", f"Doc {i}", text, "business")
+    
+    # Remoção em segmento selado vira tombstone
+    segmented.remove_document("doc0")
+    reference.remove_document("doc0")
+    
+    print("Teste 1: Consultas em vários segmentos")
+    print(f"Segmentos: {len(segmented.segments)}")
+    assert len(segmented.segments) > 1
+    for term in ["economy", "growth", "market", "news"]:
+        assert doc_ids(segmented, segmented.search_term(term)) == doc_ids(reference, reference.search_term(term))
+        assert segmented.get_term_statistics(term) == reference.get_term_statistics(term)
+    print("✓ Passou\n")
+    
+    print("Teste 2: Merge dos segmentos")
+    before = len(segmented.segments)
+    assert segmented.maybe_merge() > 0
+    print(f"Segmentos após merge: {len(segmented.segments)}")
+    assert len(segmented.segments) < before
+    assert doc_ids(segmented, segmented.search_term("economy")) == doc_ids(reference, reference.search_term("economy"))
+    assert sorted(QueryProcessor(segmented).process_query("economy OR market")) == \
+        sorted(QueryProcessor(reference).process_query("economy OR market"))
+    print("✓ Passou\n")
+    
+    print("=== Todos os testes do índice segmentado passaram! ===\n")
+
+
+def test_bitmap_postings():
+    """Testa as operações entre listas esparsas e bitmaps"""
+    print("=== Testando Postings Híbridas ===\n")
+    
+    dense = PostingList()
+    sparse = PostingList()
+    for doc in range(0, 70000, 2):
+        dense.add(doc)
+    for doc in [3, 4, 100, 65538, 65539, 69998]:
+        sparse.add(doc)
+    dense.optimize(70000)
+    sparse.optimize(70000)
+    
+    # Teste 1: Escolha automática da representação
+    print("Teste 1: Representação por densidade")
+    assert isinstance(dense.bitmap, RoaringBitmap)
+    assert sparse.bitmap is None
+    # A densidade é medida contra o corpus, não contra o intervalo dos ids
+    assert PostingList(array('I', [7]), array('I', [1])).optimize(70000).bitmap is None
+    assert PostingList(array('I', range(100, 110)), array('I', [1] * 10)).optimize(70000).bitmap is None
+    assert PostingList(array('I', range(100, 110)), array('I', [1] * 10)).optimize(100).bitmap is not None
+    print("✓ Passou\n")
+    
+    # Teste 2: Operações entre representações diferentes
+    print("Teste 2: Operações mistas")
+    dense_set, sparse_set = set(dense), set(sparse)
+    assert list(dense & sparse) == sorted(dense_set & sparse_set)
+    assert list(sparse | dense) == sorted(dense_set | sparse_set)
+    assert list(sparse - dense) == sorted(sparse_set - dense_set)
+    assert len((dense | sparse) & dense) == len(dense_set)
+    print("✓ Passou\n")
+    
+    # Teste 3: Bitmap acompanha inclusões e remoções
+    print("Teste 3: Atualização do bitmap")
+    dense.add(7, 3)
+    dense.discard(0)
+    assert 7 in dense.bitmap and 0 not in dense.bitmap
+    assert list(dense.bitmap) == list(dense)
+    assert dense.frequency(7) == 3
+    print("✓ Passou\n")
+    
+    print("=== Todos os testes de postings passaram! ===\n")
+
+
+def test_query_cache():
+    """Testa o cache de resultados de consultas"""
+    print("=== Testando Cache de Consultas ===\n")
+    
+    index = InvertedIndex()
+    index.add_document("doc1", "Doc 1", "economy growth", "business")
+    index.add_document("doc2", "Doc 2", "economy recession", "business")
+    index.add_document("doc3", "Doc 3", "growth market", "business")
+    
+    cache = QueryCache()
+    processor = QueryProcessor(index, cache=cache)
+    
+    # Teste 1: Páginas seguintes e consultas equivalentes vêm do cache
+    print("Teste 1: Acertos no cache")
+    first = processor.process_query_top_k("economy OR market", 1)
+    assert processor.process_query_top_k("economy OR market", 2)[1][:1] == first[1]
+    assert processor.process_query_top_k("market  OR economy", 3) == \
+        QueryProcessor(index).process_query_top_k("economy OR market", 3)
+    stats = cache.get_statistics()
+    print(f"Estatísticas: {stats}")
+    assert stats['hits'] == 2 and stats['misses'] == 1
+    print("✓ Passou\n")
+    
+    # Teste 2: Alterar o índice invalida as entradas
+    print("Teste 2: Invalidação pela versão do índice")
+    index.add_document("doc4", "Doc 4", "market news", "business")
+    total, _ = processor.process_query_top_k("economy OR market", 1)
+    assert total == 4 and cache.get_statistics()['invalidations'] == 1
+    print("✓ Passou\n")
+    
+    # Teste 3: Limite de memória remove as entradas menos usadas
+    print("Teste 3: Remoção LRU")
+    small = QueryCache(max_bytes=1200)
+    processor = QueryProcessor(index, cache=small)
+    for query in ["economy", "market", "growth", "recession", "news"]:
+        processor.process_query_top_k(query, 1)
+    stats = small.get_statistics()
+    assert stats['bytes'] <= 1200 and stats['evictions'] > 0
+    assert processor.normalize_query("economy") not in small.entries
+    assert processor.normalize_query("news") in small.entries
+    print("✓ Passou\n")
+    
+    # Teste 4: Listas por termo compartilhadas, somente leitura e invalidadas
+    print("Teste 4: Cache de postings por termo")
+    postings = index.search_term("market")
+    assert index.search_term("market") is postings
+    try:
+        postings.add(99)
+        assert False, "PostingView deveria ser somente leitura"
+    except TypeError:
+        pass
+    
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(index.search_term("market")))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(result is postings for result in results)
+    
+    assert index.search_term("Market") is postings
+    index.add_document("doc5", "Doc 5", "market", "business")
+    assert len(index.search_term("market")) == len(postings) + 1
+    assert len(index.search_term("Market")) == len(postings) + 1
+    assert index.search_term("economy") is index.search_term("economy")
+    print("✓ Passou\n")
+    
+    print("=== Todos os testes do cache passaram! ===\n")
+
+
+def test_suggester():
+    """Testa o autocompletar por prefixo"""
+    print("=== Testando Autocompletar ===\n")
+    
+    index = InvertedIndex()
+    index.add_document("doc1", "Doc 1", "economy economy economic ecology", "business")
+    index.add_document("doc2", "Doc 2", "economy economic market", "business")
+    
+    # Teste 1: Termos ordenados pela frequência no corpus
+    print("Teste 1: Sugestões por prefixo")
+    suggestions = index.suggest("eco")
+    print(f"Prefixo 'eco': {suggestions}")
+    assert suggestions == [("economy", 3), ("economic", 2), ("ecology", 1)]
+    assert index.suggest("econ", 1) == [("economy", 3)]
+    assert index.suggest("x") == []
+    print("✓ Passou\n")
+    
+    # Teste 2: Anotações refeitas depois de alterar o índice
+    print("Teste 2: Sugestões após atualização")
+    index.add_document("doc3", "Doc 3", "ecology ecology ecology", "science")
+    assert index.suggest("eco")[0] == ("ecology", 4)
+    print("✓ Passou\n")
+    
+    # Teste 3: Escritas atualizam só os termos alterados, com o resultado da reconstrução
+    print("Teste 3: Atualização incremental")
+    suggester = index._suggester
+    index.add_document("doc4", "Doc 4", "economics econ economy economy", "business")
+    index.remove_document("doc3")
+    index.add_document("doc5", "Doc 5", "ecologist economic", "science")
+    rebuilt = Suggester(sorted(index.corpus_term_freq.items()))
+    for prefix in ["e", "ec", "eco", "econ", "ecol", "m"]:
+        assert index.suggest(prefix) == rebuilt.suggest(prefix), prefix
+    assert index._suggester is suggester
+    
+    segmented = SegmentedIndex(flush_threshold=2)
+    segmented.add_document("doc1", "Doc 1", "economy economy economic", "business")
+    assert segmented.suggest("eco") == [("economy", 2), ("economic", 1)]
+    segmented.add_document("doc2", "Doc 2", "economic economic ecology", "business")
+    segmented.remove_document("doc1")
+    assert segmented.suggest("eco") == [("economic", 2), ("ecology", 1)]
+    print("✓ Passou\n")
+    
+    print("=== Todos os testes do autocompletar passaram! ===\n")
+
+
+def test_positional_index():
+    """Testa o índice posicional: consultas por frase e trechos"""
+    print("=== Testando Índice Posicional ===\n")
+    
+    index = InvertedIndex(positional=True)
+    index.add_document("doc1", "Doc 1", "Economic growth slowed. Growth of the economy", "business")
+    index.add_document("doc2", "Doc 2", "The economy showed economic growth", "business")
+    index.add_document("doc3", "Doc 3", "Reconomic growthing is not economic", "tech")
+    
+    # Teste 1: Frase exige os termos em sequência
+    print("Teste 1: Consulta por frase")
+    processor = QueryProcessor(index)
+    assert {doc for doc, _ in processor.process_query('"economic growth"')} == {"doc1", "doc2"}
+    assert {doc for doc, _ in processor.process_query('"growth economic"')} == set()
+    assert {doc for doc, _ in processor.process_query('"the economy" AND showed')} == {"doc2"}
+    assert processor.explain('"economic growth"')['phrase'] == "economic growth"
+    print("✓ Passou\n")
+    
+    # Teste 2: Destaque na posição exata do termo, não dentro de outra palavra
+    print("Teste 2: Trecho pelo offset do termo")
+    snippet = processor.generate_snippet("doc3", ["economic"])
+    print(f"Trecho: {snippet}")
+    assert "<mark>economic</mark>" in snippet and "R<mark>" not in snippet
+    print("✓ Passou\n")
+    
+    # Teste 3: Posições gravadas e lidas do arquivo binário
+    print("Teste 3: Persistência das posições")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "index.bin")
+        index.save_index(path)
+        
+        restored = InvertedIndex()
+        assert restored.load_index(path)
+        assert restored.positional and restored.positions == index.positions
+        
+        mapped = MappedIndex(path)
+        assert QueryProcessor(mapped).process_query('"economic growth"') == processor.process_query('"economic growth"')
+        assert mapped.get_term_positions("doc3", ["economic"]) == index.get_term_positions("doc3", ["economic"])
+        mapped.close()
+    print("✓ Passou\n")
+    
+    print("=== Todos os testes do índice posicional passaram! ===\n")
+
+
+def test_document_store():
+    """Testa o armazenamento dos documentos em blocos comprimidos"""
+    print("=== Testando Armazenamento de Documentos ===\n")
+    
+    contents = [f"document {i} " + "economy growth " * (i % 7) for i in range(50)]
+    
+    # Teste 1: Registros divididos em vários blocos
+    print("Teste 1: Leitura dos registros")
+    store = DocumentStore(block_size=256)
+    for content in contents:
+        store.append(content)
+    store.put(52, "last")
+    stats = store.get_statistics()
+    print(f"Estatísticas: {stats}")
+    assert stats['blocks'] > 1 and stats['stored_bytes'] < stats['raw_bytes']
+    assert [store.get(i) for i in range(50)] == contents
+    assert store.get(51) == "" and store.get(52) == "last"
+    print("✓ Passou\n")
+    
+    # Teste 2: Serialização, com e sem registros descartados
+    print("Teste 2: Serialização")
+    restored = DocumentStore.from_buffer(store.encode())
+    assert [restored.get(i) for i in range(len(store))] == [store.get(i) for i in range(len(store))]
+    restored.append("appended")
+    assert restored.get(53) == "appended"
+    compacted = DocumentStore.from_buffer(store.encode([1, 3, 52]))
+    assert len(compacted) == 3 and compacted.get(2) == "last" and compacted.get(0) == contents[1]
+    print("✓ Passou\n")
+    
+    # Teste 3: Índice guarda só os metadados; removidos somem ao salvar
+    print("Teste 3: Conteúdo fora do índice")
+    index = InvertedIndex()
+    index.add_document("doc1", "Doc 1", "economy growth", "business")
+    index.add_document("doc2", "Doc 2", "market recession", "business")
+    index.remove_document("doc1")
+    assert "content" not in index.documents["doc2"]
+    assert index.get_content("doc2") == "market recession"
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "index.bin")
+        index.save_index(path)
+        mapped = MappedIndex(path)
+        assert mapped.get_document("doc2") == index.get_document("doc2")
+        assert mapped.get_content("doc1") is None
+        assert len(mapped.reader.bodies) == 1
+        mapped.close()
+    print("✓ Passou\n")
+    
+    print("=== Todos os testes do armazenamento de documentos passaram! ===\n")
+
+
+def test_matrix_scorer():
+    """Testa a pontuação vetorizada (NumPy) contra a pontuação em Python"""
+    print("=== Testando Pontuação Vetorizada ===\n")
+    
+    index = InvertedIndex()
+    for i in range(60):
+        content = "economy " * (i % 5 + 1) + "growth " * (i % 3) + ("market" if i % 4 else "")
+        index.add_document(f"doc{i}", f"Doc {i}", content, "business")
+    
+    queries = ["economy", "economy OR market", "growth AND economy", "econ* OR growth"]
+    python_processor = QueryProcessor(index, vectorized=False)
+    processor = QueryProcessor(index)
+    processor.warm_up()
+    
+    if not HAS_NUMPY:
+        # Teste 1: Sem NumPy, a pontuação continua em Python
+        print("Teste 1: Fallback sem NumPy")
+        assert not processor.vectorized
+        assert processor.process_query_top_k("economy OR market", 5) == \
+            python_processor.process_query_top_k("economy OR market", 5)
+        print("✓ Passou\n")
+        
+        print("=== Todos os testes de pontuação vetorizada passaram! ===\n")
+        return
+    
+    # Teste 1: Mesmos scores, empates pelo menor id
+    print("Teste 1: Scores iguais aos da avaliação em Python")
+    assert processor.vectorized
+    for query in queries:
+        expected = sorted(python_processor.process_query(query), key=lambda x: (-x[1], index.doc_numbers[x[0]]))
+        assert processor.process_query(query) == expected, query
+        assert processor.process_query_top_k(query, 7) == (len(expected), expected[:7]), query
+    print("✓ Passou\n")
+    
+    # Teste 2: Matriz remontada depois de alterar o índice
+    print("Teste 2: Matriz atualizada com o índice")
+    processor.process_query("economy")
+    index.add_document("doc60", "Doc 60", "economy " * 50, "business")
+    # Matriz desatualizada: a consulta é pontuada em Python enquanto ela é remontada
+    assert processor.process_query_top_k("economy", 1)[1][0][0] == "doc60"
+    scorer = processor._scorers.build()
+    assert scorer.version == index.version and processor._scorers.get() is scorer
+    assert processor.process_query_top_k("economy", 3) == python_processor.process_query_top_k("economy", 3)
+    print("✓ Passou\n")
+    
+    # Teste 3: Escritas durante a remontagem em segundo plano
+    print("Teste 3: Escritas durante a remontagem")
+    for i in range(61, 1000):
+        index.add_document(f"doc{i}", f"Doc {i}", f"economy growth term{i} market", "business")
+    scorers = processor._scorers
+    assert scorers.get() is None  # índice alterado: inicia a remontagem
+    while scorers._builder is not None:
+        index.add_document(f"doc{i}", f"Doc {i}", f"economy growth term{i}", "business")
+        i += 1
+    for j in range(200):
+        index.add_document(f"late{j}", f"Late {j}", "economy market", "business")
+    assert index.total_docs == len(index.documents)
+    assert len(index.search_term("economy")) == index.doc_freq["economy"] == index.total_docs
+    scorer = scorers.build()
+    assert scorer.version == index.version
+    assert processor.process_query_top_k("economy OR market", 5) == \
+        python_processor.process_query_top_k("economy OR market", 5)
+    print("✓ Passou\n")
+    
+    print("=== Todos os testes de pontuação vetorizada passaram! ===\n")
+    
+    
+def test_batch_queries():
+    """Testa a avaliação de consultas em lote"""
+    print("=== Testando Consultas em Lote ===\n")
+    
+    index = InvertedIndex()
+    index.add_document("doc1", "Doc 1", "economy growth economy", "business")
+    index.add_document("doc2", "Doc 2", "economy recession", "business")
+    index.add_document("doc3", "Doc 3", "growth market", "business")
+    processor = QueryProcessor(index)
+    
+    queries = ["economy OR growth", "market", "growth OR economy", "econ* AND recession", "zzzz"]
+    
+    # Teste 1: Mesmos resultados das consultas avulsas, na ordem de entrada
+    print("Teste 1: Resultados na ordem de entrada")
+    batch = processor.process_batch(queries, k=2, workers=2)
+    assert [entry['query'] for entry in batch] == queries
+    for entry in batch:
+        assert (entry['total_results'], entry['results']) == processor.process_query_top_k(entry['query'], 2)
+        assert entry['time_ms'] >= 0
+    print("✓ Passou\n")
+    
+    # Teste 2: Cada termo é buscado no índice uma única vez
+    print("Teste 2: Termos compartilhados pelo lote")
+    calls = []
+    search_term = index.search_term
+    index.search_term = lambda term: calls.append(term) or search_term(term)
+    processor.process_batch(queries)
+    print(f"Termos buscados: {sorted(calls)}")
+    assert sorted(calls) == sorted(set(calls))
+    print("✓ Passou\n")
+    
+    print("=== Todos os testes de consultas em lote passaram! ===\n")
+
+
+def test_iter_results():
+    """Testa a geração do resultado ranqueado sob demanda"""
+    print("=== Testando Resultado sob Demanda ===\n")
+    
+    index = InvertedIndex()
+    for i in range(20):
+        index.add_document(f"doc{i}", f"Doc {i}", "economy " * (i % 4 + 1) + "growth " * (i % 3), "business")
+    processor = QueryProcessor(index, vectorized=False)
+    
+    # Teste 1: Mesma ordem de scores do ranking completo, empates pelo menor id
+    print("Teste 1: Ordem do resultado")
+    expected = processor.process_query("economy OR growth")
+    results = list(processor.iter_results("economy OR growth"))
+    assert [score for _, score in results] == [score for _, score in expected]
+    assert sorted(results) == sorted(expected)
+    for (doc, score), (next_doc, next_score) in zip(results, results[1:]):
+        assert score > next_score or index.doc_numbers[doc] < index.doc_numbers[next_doc]
+    assert list(processor.iter_results("zzzz")) == []
+    print("✓ Passou\n")
+    
+    # Teste 2: Os scores são calculados antes da primeira linha; o resto é sob demanda
+    print("Teste 2: Consumo parcial")
+    generator = processor.iter_results("economy")
+    first = next(generator)
+    assert first == processor.process_query_top_k("economy", 1)[1][0]
+    generator.close()
+    print("✓ Passou\n")
+    
+    print("=== Todos os testes do resultado sob demanda passaram! ===\n")
+
+
+def test_concurrent_serving():
+    """Testa consultas concorrentes e a pontuação em processos"""
+    print("=== Testando Atendimento Concorrente ===\n")
+    
+    index = InvertedIndex()
+    for i in range(40):
+        index.add_document(f"doc{i}", f"Doc {i}",
+                           "economy " * (i % 5 + 1) + "growth " * (i % 3) + "market " * (i % 7), "business")
+    queries = ["economy", "economy OR growth", "growth AND market", "econom*", "market NOT growth"]
+    expected = {query: QueryProcessor(index).process_query_top_k(query, 10) for query in queries}
+    
+    # Teste 1: Threads compartilhando o processador e o cache têm os resultados da execução serial
+    print("Teste 1: Leituras concorrentes")
+    processor = QueryProcessor(index, cache=QueryCache(1024 * 1024))
+    errors = []
+    
+    def run():
+        for _ in range(20):
+            for query in queries:
+                if processor.process_query_top_k(query, 10) != expected[query]:
+                    errors.append(query)
+    
+    threads = [threading.Thread(target=run) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    print("✓ Passou\n")
+    
+    # Teste 2: Processos do pool abrem o arquivo do índice e dão o mesmo ranking
+    print("Teste 2: Pontuação em processos")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "index.bin")
+        index.save_index(path)
+        mapped = MappedIndex(path)
+        
+        pool = ScoringPool(path, 2)
+        try:
+            assert pool.start()
+            pooled = QueryProcessor(mapped, cache=QueryCache(1024 * 1024), pool=pool)
+            for query in queries:
+                assert pooled.process_query_top_k(query, 10) == expected[query]
+                assert pooled.process_query_top_k(query, 5) == (expected[query][0], expected[query][1][:5])
+        finally:
+            pool.close()
+            mapped.close()
+    print("✓ Passou\n")
+    
+    print("=== Todos os testes de atendimento concorrente passaram! ===\n")
+
+
 def main():
     """Executa todos os testes"""
     print("\n" + "="*50)
@@ -134,6 +924,20 @@ def main():
     try:
         test_compact_trie()
         test_query_processor()
+        test_term_statistics()
+        test_binary_index()
+        test_parallel_indexing()
+        test_incremental_indexing()
+        test_segmented_index()
+        test_bitmap_postings()
+        test_query_cache()
+        test_suggester()
+        test_positional_index()
+        test_document_store()
+        test_matrix_scorer()
+        test_batch_queries()
+        test_iter_results()
+        test_concurrent_serving()
         
         print("\n" + "="*50)
         print("✓✓✓ TODOS OS TESTES PASSARAM! ✓✓✓")